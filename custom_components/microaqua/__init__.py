@@ -1,21 +1,151 @@
 from __future__ import annotations
 
-from homeassistant.core import HomeAssistant
+from functools import partial
+
+import voluptuous as vol
+
+from homeassistant.components import websocket_api
+from homeassistant.core import HomeAssistant, SupportsResponse
 from homeassistant.config_entries import ConfigEntry
+from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers import config_validation as cv
 
-from .const import DOMAIN
+from .const import (
+    DOMAIN,
+    SERVICE_PROFILE,
+    SERVICE_GET_HISTORY,
+    SERVICE_SEND_COMMANDS,
+    DEFAULT_PROFILE_DURATION,
+    DEFAULT_PROFILE_TOP,
+    DEFAULT_TIMEOUT,
+    DEFAULT_PERSISTENT_CONNECTION,
+    DEFAULT_DATA_VALID_SECONDS,
+    DEFAULT_UPDATE_INTERVAL,
+    DEFAULT_MAX_UPDATE_INTERVAL,
+    DEFAULT_HISTORY_WINDOW,
+    DEFAULT_AGGREGATE_INTERVAL,
+)
+from .api import (
+    HISTORY_SERVICE_SCHEMA,
+    SEND_COMMANDS_SCHEMA,
+    async_handle_get_history,
+    async_handle_send_commands,
+    ws_history,
+)
+from .coordinator import MicroAQUACoordinator
+from .engine import MicroAQUAPollEngine
+from .profiler import async_handle_profile
 
 
 PLATFORMS: list[str] = ["sensor", "switch", "number"]
 
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Optional("duration", default=DEFAULT_PROFILE_DURATION): vol.All(
+            vol.Coerce(float), vol.Range(min=1, max=600)
+        ),
+        vol.Optional("top", default=DEFAULT_PROFILE_TOP): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=500)
+        ),
+    }
+)
+
+
+async def async_setup(hass: HomeAssistant, config) -> bool:
+    """Register the integration-wide services."""
+    hass.services.async_register(
+        DOMAIN, SERVICE_PROFILE, partial(async_handle_profile, hass), schema=PROFILE_SCHEMA
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_HISTORY,
+        partial(async_handle_get_history, hass),
+        schema=HISTORY_SERVICE_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SEND_COMMANDS,
+        partial(async_handle_send_commands, hass),
+        schema=SEND_COMMANDS_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    websocket_api.async_register_command(hass, ws_history)
+    return True
+
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
-    """Set up microAQUA from a config entry."""
+    """Set up microAQUA from a config entry.
+
+    The coordinator is created and polled once here, before any platform
+    is set up, so sensor/switch/number all find it in hass.data and their
+    entities start with real data.
+    """
+    def _get_entry_value(key, default=None):
+        return entry.options.get(key, entry.data.get(key, default))
+
+    coordinator = MicroAQUACoordinator(
+        hass,
+        _get_entry_value("ip"),
+        _get_entry_value("port"),
+        _get_entry_value("payload"),
+        _get_entry_value("name"),
+        update_interval=_get_entry_value("update_interval", DEFAULT_UPDATE_INTERVAL),
+        max_update_interval=_get_entry_value(
+            "max_update_interval", DEFAULT_MAX_UPDATE_INTERVAL
+        ),
+        timeout=_get_entry_value("timeout", DEFAULT_TIMEOUT),
+        data_valid_seconds=_get_entry_value(
+            "data_valid_seconds", DEFAULT_DATA_VALID_SECONDS
+        ),
+        persistent_connection=_get_entry_value(
+            "persistent_connection", DEFAULT_PERSISTENT_CONNECTION
+        ),
+        history_window=_get_entry_value("history_window", DEFAULT_HISTORY_WINDOW),
+        aggregate_interval=_get_entry_value(
+            "aggregate_interval", DEFAULT_AGGREGATE_INTERVAL
+        ),
+    )
+
+    await coordinator.async_refresh()
+    if not coordinator.available:
+        # HA ponowi konfigurację później (z rosnącym odstępem)
+        await coordinator.async_close()
+        raise ConfigEntryNotReady(
+            f"No valid reply from {_get_entry_value('ip')}:{_get_entry_value('port')}"
+        )
+
+    entry.async_on_unload(coordinator.async_close)
+    # Zmiana opcji = przeładowanie wpisu (nowy koordynator z nowymi opcjami)
+    entry.async_on_unload(entry.add_update_listener(_async_update_listener))
+    MicroAQUAPollEngine.async_get(hass).async_register(coordinator)
+
     hass.data.setdefault(DOMAIN, {})
+    hass.data[DOMAIN][entry.entry_id] = {"coordinator": coordinator}
+
+    # Platformy równolegle, z danymi już w koordynatorze
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     return True
 
 
+async def _async_update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
-    """Unload microAQUA config entry."""
-    return await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    """Unload microAQUA config entry.
+
+    Entities go first (they drop their coordinator listeners and
+    heartbeat timers), then the entry's hass.data is released. The
+    coordinator itself is closed by the async_on_unload callbacks
+    registered in async_setup_entry, which HA runs after this returns.
+    """
+    unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    if unload_ok:
+        entries = hass.data.get(DOMAIN, {})
+        entries.pop(entry.entry_id, None)
+        if not entries:
+            hass.data.pop(DOMAIN, None)
+    return unload_ok
@@ -0,0 +1,79 @@
+"""Per-interval min/max/mean of pH and temperatures (downsampling)."""
+from __future__ import annotations
+
+from typing import Optional
+
+from .decoder import FIELD_COUNT, MicroAQUASnapshot
+
+# Pola agregowane: pH i temperatury 1-4
+AGGREGATE_SERIES: tuple[int, ...] = (0, 1, 2, 3, 4)
+
+# Wirtualny indeks pola "zamknięto przedział" - kontekst encji agregatów
+AGGREGATE_FIELD = FIELD_COUNT + 1
+AGGREGATE_CONTEXT = frozenset({AGGREGATE_FIELD})
+
+
+class RunningStats:
+    """min/max/mean of one series, updated in O(1) per sample."""
+
+    __slots__ = ("count", "total", "min", "max")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def result(self) -> Optional[tuple[float, float, float]]:
+        if not self.count:
+            return None
+        return self.min, self.max, self.total / self.count
+
+
+class IntervalAggregator:
+    """Aggregates samples into wall-clock aligned intervals.
+
+    Only the running stats of the open interval and the result of the
+    last closed one are kept, whatever the poll rate.
+    """
+
+    __slots__ = ("interval", "_bucket", "_running", "results", "closed_at")
+
+    def __init__(self, interval: int):
+        self.interval = interval
+        self._bucket: Optional[int] = None
+        self._running = {index: RunningStats() for index in AGGREGATE_SERIES}
+        # Wynik ostatniego zamkniętego przedziału: indeks -> (min, max, mean)
+        self.results: dict[int, Optional[tuple[float, float, float]]] = dict.fromkeys(
+            AGGREGATE_SERIES
+        )
+        self.closed_at: Optional[float] = None
+
+    def add(self, timestamp: float, snapshot: MicroAQUASnapshot) -> bool:
+        """Add one sample; True if it closed the previous interval."""
+        bucket = int(timestamp // self.interval)
+        closed = False
+        if bucket != self._bucket:
+            if self._bucket is not None:
+                for index, stats in self._running.items():
+                    self.results[index] = stats.result()
+                    stats.reset()
+                self.closed_at = bucket * self.interval
+                closed = True
+            self._bucket = bucket
+        for index, stats in self._running.items():
+            value = snapshot.value(index)
+            if value is not None:
+                stats.add(value)
+        return closed
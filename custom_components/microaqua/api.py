@@ -0,0 +1,123 @@
+"""Service/websocket access to controllers: sample history and command batches."""
+from __future__ import annotations
+
+from typing import Any, Optional
+
+import voluptuous as vol
+
+from homeassistant.components import websocket_api
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN, MAX_BATCH_COMMANDS, WS_TYPE_HISTORY
+
+HISTORY_SERVICE_SCHEMA = vol.Schema(
+    {
+        vol.Optional("entry_id"): cv.string,
+        vol.Optional("start_time"): cv.datetime,
+        vol.Optional("end_time"): cv.datetime,
+    }
+)
+
+
+def _at_command(value: Any) -> str:
+    """One AT command on one line (CRLF is added when sending)."""
+    value = cv.string(value).strip()
+    if not value.upper().startswith("AT+") or "\r" in value or "\n" in value:
+        raise vol.Invalid(f"Not a single AT command: {value!r}")
+    return value
+
+
+SEND_COMMANDS_SCHEMA = vol.Schema(
+    {
+        vol.Required("entry_id"): cv.string,
+        vol.Required("commands"): vol.All(
+            cv.ensure_list,
+            vol.Length(min=1, max=MAX_BATCH_COMMANDS),
+            [_at_command],
+        ),
+    }
+)
+
+
+def _coordinators(hass: HomeAssistant, entry_id: Optional[str]) -> dict[str, Any]:
+    entries = hass.data.get(DOMAIN, {})
+    if entry_id is not None:
+        if entry_id not in entries or "coordinator" not in entries[entry_id]:
+            raise HomeAssistantError(f"Unknown microAQUA entry: {entry_id}")
+        return {entry_id: entries[entry_id]["coordinator"]}
+    return {
+        key: data["coordinator"]
+        for key, data in entries.items()
+        if isinstance(data, dict) and "coordinator" in data
+    }
+
+
+def _timestamp(value) -> Optional[float]:
+    """Datetime (naive = HA time zone) or epoch seconds -> epoch seconds."""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    return dt_util.as_utc(value).timestamp()
+
+
+def _history(coordinator, start, end) -> dict[str, Any]:
+    history = coordinator.history
+    if history is None:
+        return {"name": coordinator.display_name, "samples": 0}
+    result = history.query(_timestamp(start), _timestamp(end))
+    result["name"] = coordinator.display_name
+    result["samples"] = len(result["time"])
+    return result
+
+
+async def async_handle_get_history(hass: HomeAssistant, call: ServiceCall) -> ServiceResponse:
+    """microaqua.get_history: samples of one (or every) controller."""
+    start = call.data.get("start_time")
+    end = call.data.get("end_time")
+    return {
+        entry_id: _history(coordinator, start, end)
+        for entry_id, coordinator in _coordinators(hass, call.data.get("entry_id")).items()
+    }
+
+
+async def async_handle_send_commands(
+    hass: HomeAssistant, call: ServiceCall
+) -> ServiceResponse:
+    """microaqua.send_commands: ordered AT commands over one connection.
+
+    Without a requested response a failed command (``ERROR`` or a
+    connection failure) raises, so a script stops there too; a command
+    the device did not answer is not a failure, as for the switches.
+    """
+    entry_id = call.data["entry_id"]
+    coordinator = _coordinators(hass, entry_id)[entry_id]
+    results = await coordinator.async_send_commands(call.data["commands"])
+    if call.return_response:
+        return {"results": results}
+    for result in results:
+        if "error" in result:
+            raise HomeAssistantError(f"{result['command']} failed: {result['error']}")
+    return None
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): WS_TYPE_HISTORY,
+        vol.Required("entry_id"): str,
+        vol.Optional("start_time"): vol.Any(cv.datetime, vol.Coerce(float)),
+        vol.Optional("end_time"): vol.Any(cv.datetime, vol.Coerce(float)),
+    }
+)
+@callback
+def ws_history(hass: HomeAssistant, connection, msg: dict) -> None:
+    """Samples of one controller; times as datetimes or epoch seconds."""
+    try:
+        coordinator = _coordinators(hass, msg["entry_id"])[msg["entry_id"]]
+    except HomeAssistantError as err:
+        connection.send_error(msg["id"], websocket_api.const.ERR_NOT_FOUND, str(err))
+        return
+    connection.send_result(
+        msg["id"], _history(coordinator, msg.get("start_time"), msg.get("end_time"))
+    )
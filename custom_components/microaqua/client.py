@@ -0,0 +1,438 @@
+"""Asyncio TCP client for the microAQUA controller."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import socket
+from typing import Callable, NamedTuple, Optional, Sequence, Union
+
+from .resolver import HostResolver
+from .stats import MicroAQUAStats
+
+_LOGGER = logging.getLogger(__name__)
+
+READ_SIZE = 2048
+# Najdłuższa niepełna linia trzymana w buforze (ramka ma ~100 bajtów)
+MAX_FRAME_SIZE = 4096
+
+# TCP keepalive: pierwsza sonda po 30 s ciszy, potem co 10 s, 3 próby
+KEEPALIVE_IDLE = 30
+KEEPALIVE_INTERVAL = 10
+KEEPALIVE_COUNT = 3
+
+# Kolejność obsługi w kolejce: komendy użytkownika przed odpytywaniem
+PRIORITY_COMMAND = 0
+PRIORITY_POLL = 1
+
+
+def _enable_keepalive(sock: Optional[socket.socket]) -> None:
+    """Turn on TCP keepalive (per-option, skipping what the OS lacks)."""
+    if sock is None:
+        return
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    for name, value in (
+        ("TCP_KEEPIDLE", KEEPALIVE_IDLE),
+        ("TCP_KEEPINTVL", KEEPALIVE_INTERVAL),
+        ("TCP_KEEPCNT", KEEPALIVE_COUNT),
+    ):
+        option = getattr(socket, name, None)
+        if option is not None:
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, option, value)
+            except OSError:
+                pass
+
+
+class FrameError(Exception):
+    """The reply could not be framed (overflow or no expected prefix)."""
+
+
+class RequestSkipped(Exception):
+    """The deadline passed while the request was queued; nothing was sent."""
+
+
+class _Batch(NamedTuple):
+    """Messages sent in one queue slot (see MicroAQUAClient.async_request_batch)."""
+
+    messages: tuple[str, ...]
+    stop: Optional[Callable[[bytes], bool]]
+
+
+class FrameBuffer:
+    """Bounded byte buffer splitting the stream into CRLF-terminated lines.
+
+    Works on bytes only; a reply split over several reads or several
+    replies in one read are both fine. Lines that do not carry the
+    expected ``AT+<payload>=`` prefix are skipped.
+    """
+
+    __slots__ = ("_buf", "_limit", "skipped")
+
+    def __init__(self, limit: int = MAX_FRAME_SIZE):
+        self._buf = bytearray()
+        self._limit = limit
+        # Ostatnia linia bez oczekiwanego prefiksu (do komunikatu błędu)
+        self.skipped: Optional[bytes] = None
+
+    def __len__(self) -> int:
+        return len(self._buf)
+
+    def clear(self) -> None:
+        self._buf.clear()
+        self.skipped = None
+
+    def feed(self, data: bytes) -> None:
+        buf = self._buf
+        buf += data
+        if len(buf) - (buf.rfind(b"\n") + 1) > self._limit:
+            buf.clear()
+            raise FrameError(f"No line end within {self._limit} bytes")
+
+    def pop_line(self) -> Optional[bytes]:
+        buf = self._buf
+        end = buf.find(b"\n")
+        if end < 0:
+            return None
+        line = bytes(buf[:end])
+        del buf[: end + 1]
+        return line
+
+    def pop_frame(
+        self, prefix: Optional[bytes] = None, ignore: Optional[bytes] = None
+    ) -> Optional[bytes]:
+        """Next complete reply, or None if more data is needed.
+
+        With a prefix only the part after it is returned (garbage in front
+        of the prefix is ignored); without one, the first non-empty line
+        that does not contain ``ignore``.
+        """
+        while (line := self.pop_line()) is not None:
+            if prefix is None:
+                line = line.strip()
+                if line and (ignore is None or ignore not in line):
+                    return line
+                if line:
+                    self.skipped = line
+                continue
+            start = line.find(prefix)
+            if start >= 0:
+                return line[start + len(prefix):].strip()
+            self.skipped = line.strip()
+        return None
+
+
+class MicroAQUAClient:
+    """One controller, one connection, one request at a time.
+
+    All traffic goes through a priority queue served by a single worker
+    task, so polls and commands never interleave on the wire and each
+    reply is read by the request that caused it. Commands jump ahead of
+    queued polls.
+
+    In persistent mode the stream is opened lazily, kept open between
+    requests and re-opened after any error. Otherwise every request gets
+    its own short-lived connection (the original behaviour, minus the
+    executor hops).
+
+    A request may carry a ``deadline``: one budget for the queue wait and
+    the whole exchange (connect, send, receive, reconnect retry). A
+    request still queued when it expires is dropped unsent (RequestSkipped,
+    not a device error); one on the wire is cancelled
+    (asyncio.TimeoutError). Cancelling the caller also cancels its
+    exchange, so an abandoned poll never keeps the connection busy.
+
+    Host names are resolved through a cached HostResolver; a connect
+    tries every resolved address in turn.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        *,
+        timeout: float,
+        persistent: bool = True,
+        stats: Optional[MicroAQUAStats] = None,
+    ):
+        self._host = host
+        self._port = port
+        self._timeout = timeout
+        self._persistent = persistent
+        self.stats = stats if stats is not None else MicroAQUAStats()
+        self._resolver = HostResolver(host, port, stats=self.stats)
+
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._buffer = FrameBuffer()
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._seq = 0
+        self._worker: Optional[asyncio.Task] = None
+        # Zapytanie na łączu: (future wywołującego, zadanie wymiany)
+        self._active: Optional[tuple[asyncio.Future, asyncio.Task]] = None
+        self._closed = False
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def async_request(
+        self,
+        message: str,
+        prefix: Optional[bytes] = None,
+        *,
+        priority: int = PRIORITY_POLL,
+        ignore: Optional[bytes] = None,
+        deadline: Optional[float] = None,
+    ) -> bytes:
+        """Queue a message and return its reply as bytes.
+
+        See FrameBuffer.pop_frame for how ``prefix``/``ignore`` pick the reply.
+        ``deadline`` (seconds from now) bounds the whole request; exceeding
+        it on the wire raises asyncio.TimeoutError and counts as an overrun,
+        in the queue it raises RequestSkipped and counts as a skipped poll.
+        """
+        return await self._enqueue(priority, message, prefix, ignore, deadline)
+
+    async def async_request_batch(
+        self,
+        messages: Sequence[str],
+        *,
+        stop: Optional[Callable[[bytes], bool]] = None,
+        priority: int = PRIORITY_COMMAND,
+        ignore: Optional[bytes] = None,
+    ) -> list[Union[bytes, Exception]]:
+        """Send messages in order in one queue slot, over one connection.
+
+        Nothing else goes on the wire in between. A message not answered
+        within the timeout gets its TimeoutError and the batch goes on; it
+        ends at the first message that fails otherwise (its exception is
+        the last item) or whose reply satisfies ``stop``, and the
+        remaining messages are not sent.
+        """
+        return await self._enqueue(
+            priority, _Batch(tuple(messages), stop), None, ignore, None
+        )
+
+    async def _enqueue(self, priority, message, prefix, ignore, deadline):
+        if self._closed:
+            # Po async_close nie wolno wskrzesić workera ani połączenia
+            raise ConnectionAbortedError("Client closed")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        now = loop.time()
+        expires = None if deadline is None else now + deadline
+        self._seq += 1
+        self._queue.put_nowait(
+            (priority, self._seq, now, expires, message, prefix, ignore, future)
+        )
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._run())
+        try:
+            return await future
+        except asyncio.CancelledError:
+            active = self._active
+            if active is not None and active[0] is future:
+                # Wywołujący zrezygnował w trakcie wymiany - nie kończymy jej w tle
+                active[1].cancel()
+            raise
+
+    async def async_close(self) -> None:
+        """Stop the worker, fail queued requests and close the connection.
+
+        Final: later requests fail with ConnectionAbortedError.
+        """
+        self._closed = True
+        worker, self._worker = self._worker, None
+        if worker is not None:
+            worker.cancel()
+            try:
+                await worker
+            except asyncio.CancelledError:
+                pass
+        while not self._queue.empty():
+            future = self._queue.get_nowait()[-1]
+            if not future.done():
+                future.set_exception(ConnectionAbortedError("Client closed"))
+        await self._disconnect()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stats = self.stats
+        while True:
+            _, _, queued, expires, message, prefix, ignore, future = (
+                await self._queue.get()
+            )
+            if future.done():
+                # Wywołujący zrezygnował (anulowanie) - nie wysyłamy
+                continue
+            now = loop.time()
+            stats.queue_wait.add(now - queued)
+            if expires is not None and now >= expires:
+                # Termin minął w kolejce - nie wysyłamy, kolejny odczyt i tak przyjdzie
+                stats.skipped_polls += 1
+                future.set_exception(RequestSkipped("Deadline passed in the queue"))
+                continue
+
+            if isinstance(message, _Batch):
+                task = loop.create_task(self._request_batch(message, ignore))
+            else:
+                task = loop.create_task(self._request(message, prefix, ignore))
+            self._active = (future, task)
+            try:
+                await asyncio.wait(
+                    (task,), timeout=None if expires is None else expires - now
+                )
+            except asyncio.CancelledError:
+                task.cancel()
+                if not future.done():
+                    future.set_exception(ConnectionAbortedError("Client closed"))
+                raise
+            finally:
+                self._active = None
+
+            if not task.done():
+                # Cały cykl przekroczył budżet - przerywamy wymianę (zamyka połączenie)
+                task.cancel()
+                await asyncio.wait((task,))
+                stats.overruns += 1
+                if not future.done():
+                    future.set_exception(
+                        asyncio.TimeoutError(
+                            f"Request exceeded its {expires - queued:.1f} s deadline"
+                        )
+                    )
+            elif task.cancelled():
+                # Przerwane przez wywołującego (future już anulowany)
+                if not future.done():
+                    future.cancel()
+            elif (err := task.exception()) is not None:
+                if not future.done():
+                    future.set_exception(err)
+            elif not future.done():
+                future.set_result(task.result())
+
+    async def _request(
+        self, message: str, prefix: Optional[bytes], ignore: Optional[bytes]
+    ) -> bytes:
+        data = await self._exchange_retry(message, prefix, ignore)
+        if not self._persistent:
+            await self._disconnect()
+        return data
+
+    async def _request_batch(
+        self, batch: _Batch, ignore: Optional[bytes]
+    ) -> list[Union[bytes, Exception]]:
+        replies: list[Union[bytes, Exception]] = []
+        for message in batch.messages:
+            try:
+                reply = await self._exchange_retry(message, None, ignore)
+            except asyncio.TimeoutError as err:
+                # Brak odpowiedzi to nie błąd - następna wiadomość na nowym połączeniu
+                replies.append(err)
+                continue
+            except (OSError, FrameError) as err:
+                replies.append(err)
+                break
+            replies.append(reply)
+            if batch.stop is not None and batch.stop(reply):
+                break
+        if not self._persistent:
+            # Bez trwałego połączenia - jedno połączenie na całą paczkę
+            await self._disconnect()
+        return replies
+
+    async def _exchange_retry(
+        self, message: str, prefix: Optional[bytes], ignore: Optional[bytes]
+    ) -> bytes:
+        reused = self.connected
+        try:
+            return await self._exchange(message, prefix, ignore)
+        except ConnectionError:
+            if not reused:
+                raise
+            # Urządzenie mogło zamknąć bezczynne połączenie - jedna próba od nowa
+            _LOGGER.debug("Stale connection to %s:%s, reconnecting", self._host, self._port)
+            return await self._exchange(message, prefix, ignore)
+
+    async def _exchange(
+        self, message: str, prefix: Optional[bytes], ignore: Optional[bytes]
+    ) -> bytes:
+        loop = asyncio.get_running_loop()
+        buffer = self._buffer
+        stats = self.stats
+        try:
+            await self._ensure_connected()
+            # Resztki po poprzedniej odpowiedzi nie należą do tego zapytania
+            buffer.clear()
+            data = message.encode("utf-8")
+            started = loop.time()
+            self._writer.write(data)
+            await asyncio.wait_for(self._writer.drain(), self._timeout)
+            sent = loop.time()
+            stats.send.add(sent - started)
+            stats.bytes_out += len(data)
+
+            deadline = sent + self._timeout
+            while (frame := buffer.pop_frame(prefix, ignore)) is None:
+                try:
+                    data = await asyncio.wait_for(
+                        self._reader.read(READ_SIZE), max(deadline - loop.time(), 0)
+                    )
+                except asyncio.TimeoutError:
+                    if buffer.skipped is not None:
+                        raise FrameError(f"Unexpected reply: {buffer.skipped!r}") from None
+                    raise
+                if not data:
+                    raise ConnectionResetError("Connection closed by device")
+                stats.bytes_in += len(data)
+                buffer.feed(data)
+            stats.receive.add(loop.time() - sent)
+            return frame
+        except BaseException:
+            # Po błędzie strumień może zawierać spóźnioną odpowiedź - zamykamy
+            await self._disconnect()
+            raise
+
+    async def _ensure_connected(self) -> None:
+        if self.connected:
+            return
+        await self._disconnect()
+        loop = asyncio.get_running_loop()
+        resolver = self._resolver
+        # Kopia - mark_failed zmienia kolejność adresów w resolverze
+        addresses = tuple(await resolver.async_addresses())
+        started = loop.time()
+        for address in addresses:
+            try:
+                self._reader, self._writer = await asyncio.wait_for(
+                    asyncio.open_connection(address, self._port), self._timeout
+                )
+                break
+            except (OSError, asyncio.TimeoutError) as err:
+                if address == addresses[-1]:
+                    raise
+                _LOGGER.debug(
+                    "Connect to %s:%s failed (%s), trying the next address",
+                    address,
+                    self._port,
+                    err,
+                )
+                resolver.mark_failed(address)
+        self.stats.connect.add(loop.time() - started)
+        self.stats.connects += 1
+        if self._persistent:
+            _enable_keepalive(self._writer.get_extra_info("socket"))
+            _LOGGER.debug("Connected to %s:%s", self._host, self._port)
+
+    async def _disconnect(self) -> None:
+        writer = self._writer
+        self._reader = None
+        self._writer = None
+        self._buffer.clear()
+        if writer is None:
+            return
+        writer.close()
+        try:
+            await asyncio.wait_for(writer.wait_closed(), self._timeout)
+        except Exception:
+            pass
@@ -7,9 +7,20 @@ from .const import (
     DEFAULT_PAYLOAD,
     DEFAULT_TIMEOUT,
     DEFAULT_UPDATE_INTERVAL,
+    DEFAULT_MAX_UPDATE_INTERVAL,
     DEFAULT_DATA_VALID_SECONDS,
+    DEFAULT_PERSISTENT_CONNECTION,
+    DEFAULT_COMPACT_MASTER_STATE,
+    DEFAULT_HISTORY_WINDOW,
+    DEFAULT_AGGREGATE_INTERVAL,
+    DEFAULT_DEADBAND_PH,
+    DEFAULT_DEADBAND_TEMP,
+    DEFAULT_DEADBAND_LED,
+    DEFAULT_DEADBAND_HEARTBEAT,
     DEFAULT_NAME,
+    DEFAULT_SUBNET,
 )
+from .discovery import async_scan
 
 async def _async_test_connection(user_input):
     """Test if we can connect to the device."""
@@ -23,11 +34,105 @@ async def _async_test_connection(user_input):
         )
 
 
+async def _async_default_subnet(hass) -> str:
+    """/24 of the HA host address (fallback: DEFAULT_SUBNET)."""
+    try:
+        from homeassistant.components.network import async_get_source_ip
+
+        ip = await async_get_source_ip(hass)
+    except Exception:  # pylint: disable=broad-except
+        return DEFAULT_SUBNET
+    return f"{ip.rsplit('.', 1)[0]}.0/24" if ip and ip.count(".") == 3 else DEFAULT_SUBNET
+
+
 class MicroAQUAConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for MicroAQUA."""
 
+    def __init__(self):
+        self._discovered: dict[str, int] = {}
+        self._scan_input: dict = {}
+
     async def async_step_user(self, user_input=None):
-        """Handle the initial step."""
+        """Choose between a LAN scan and manual entry."""
+        return self.async_show_menu(step_id="user", menu_options=["discovery", "manual"])
+
+    async def async_step_discovery(self, user_input=None):
+        """Scan a subnet for controllers (confirmed with a real AT exchange)."""
+        errors = {}
+
+        if user_input is not None:
+            try:
+                found = await async_scan(
+                    user_input["subnet"],
+                    user_input["port"],
+                    user_input["payload"],
+                    DEFAULT_TIMEOUT,
+                )
+            except ValueError:
+                errors["subnet"] = "invalid_subnet"
+            else:
+                configured = {
+                    entry.options.get("ip", entry.data.get("ip"))
+                    for entry in self._async_current_entries()
+                }
+                self._discovered = {
+                    device.ip: device.fields
+                    for device in found
+                    if device.ip not in configured
+                }
+                if self._discovered:
+                    self._scan_input = user_input
+                    return await self.async_step_pick()
+                errors["base"] = "no_devices_found"
+
+        data_schema = vol.Schema(
+            {
+                vol.Required(
+                    "subnet", default=await _async_default_subnet(self.hass)
+                ): str,
+                vol.Optional("port", default=DEFAULT_PORT): int,
+                vol.Optional("payload", default=DEFAULT_PAYLOAD): str,
+            }
+        )
+        return self.async_show_form(
+            step_id="discovery", data_schema=data_schema, errors=errors
+        )
+
+    async def async_step_pick(self, user_input=None):
+        """Pick one of the discovered controllers."""
+        if user_input is not None:
+            await self.async_set_unique_id(user_input["ip"])
+            self._abort_if_unique_id_configured()
+            data = {
+                # Domyślnie adres IP - unikalny prefiks encji dla każdego sterownika
+                "name": user_input.get("name") or user_input["ip"],
+                "ip": user_input["ip"],
+                "port": self._scan_input["port"],
+                "payload": self._scan_input["payload"],
+                "update_interval": DEFAULT_UPDATE_INTERVAL,
+                "max_update_interval": DEFAULT_MAX_UPDATE_INTERVAL,
+                "timeout": DEFAULT_TIMEOUT,
+                "data_valid_seconds": DEFAULT_DATA_VALID_SECONDS,
+                "persistent_connection": DEFAULT_PERSISTENT_CONNECTION,
+                "compact_master_state": DEFAULT_COMPACT_MASTER_STATE,
+                "history_window": DEFAULT_HISTORY_WINDOW,
+                "aggregate_interval": DEFAULT_AGGREGATE_INTERVAL,
+            }
+            return self.async_create_entry(title=data["name"] or data["ip"], data=data)
+
+        devices = {
+            ip: f"{ip} ({fields} fields)" for ip, fields in sorted(self._discovered.items())
+        }
+        data_schema = vol.Schema(
+            {
+                vol.Required("ip"): vol.In(devices),
+                vol.Optional("name"): str,
+            }
+        )
+        return self.async_show_form(step_id="pick", data_schema=data_schema)
+
+    async def async_step_manual(self, user_input=None):
+        """Enter the controller address by hand."""
         errors = {}
 
         if user_input is not None:
@@ -48,26 +153,45 @@ class MicroAQUAConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 vol.Optional("update_interval", default=DEFAULT_UPDATE_INTERVAL): vol.All(
                     vol.Coerce(int), vol.Range(min=1)
                 ),
+                vol.Optional(
+                    "max_update_interval", default=DEFAULT_MAX_UPDATE_INTERVAL
+                ): vol.All(vol.Coerce(int), vol.Range(min=1)),
                 vol.Optional("timeout", default=DEFAULT_TIMEOUT): vol.All(
                     vol.Coerce(int), vol.Range(min=1)
                 ),
                 vol.Optional(
                     "data_valid_seconds", default=DEFAULT_DATA_VALID_SECONDS
                 ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+                vol.Optional(
+                    "persistent_connection", default=DEFAULT_PERSISTENT_CONNECTION
+                ): bool,
+                vol.Optional(
+                    "compact_master_state", default=DEFAULT_COMPACT_MASTER_STATE
+                ): bool,
+                vol.Optional(
+                    "history_window", default=DEFAULT_HISTORY_WINDOW
+                ): vol.All(vol.Coerce(int), vol.Range(min=0, max=1440)),
+                vol.Optional(
+                    "aggregate_interval", default=DEFAULT_AGGREGATE_INTERVAL
+                ): vol.All(vol.Coerce(int), vol.Range(min=0, max=3600)),
             }
         )
 
-        return self.async_show_form(step_id="user", data_schema=data_schema, errors=errors)
+        return self.async_show_form(step_id="manual", data_schema=data_schema, errors=errors)
 
     @staticmethod
     @config_entries.callback
     def async_get_options_flow(config_entry):
-        return MicroAQUAOptionsFlow()
+        return MicroAQUAOptionsFlow(config_entry)
 
 
 class MicroAQUAOptionsFlow(config_entries.OptionsFlow):
     """Handle an options flow for MicroAQUA."""
 
+    def __init__(self, config_entry):
+        # Własny atrybut: HA przed 2024.11 nie ustawia self.config_entry
+        self._entry = config_entry
+
     async def async_step_init(self, user_input=None):
         errors = {}
 
@@ -75,8 +199,9 @@ class MicroAQUAOptionsFlow(config_entries.OptionsFlow):
             try:
                 await _async_test_connection(user_input)
                 title = user_input.get("name") or user_input["ip"]
+                # Tytuł i opcje jedną zmianą wpisu = jedno przeładowanie
                 self.hass.config_entries.async_update_entry(
-                    self.config_entry, title=title
+                    self._entry, title=title, options=user_input
                 )
                 return self.async_create_entry(title="", data=user_input)
             except Exception:
@@ -86,56 +211,126 @@ class MicroAQUAOptionsFlow(config_entries.OptionsFlow):
             {
                 vol.Optional(
                     "name",
-                    default=self.config_entry.options.get(
+                    default=self._entry.options.get(
                         "name",
-                        self.config_entry.data.get("name", DEFAULT_NAME),
+                        self._entry.data.get("name", DEFAULT_NAME),
                     ),
                 ): str,
                 vol.Required(
                     "ip",
-                    default=self.config_entry.options.get(
-                        "ip", self.config_entry.data.get("ip")
+                    default=self._entry.options.get(
+                        "ip", self._entry.data.get("ip")
                     ),
                 ): str,
                 vol.Optional(
                     "port",
-                    default=self.config_entry.options.get(
+                    default=self._entry.options.get(
                         "port",
-                        self.config_entry.data.get("port", DEFAULT_PORT),
+                        self._entry.data.get("port", DEFAULT_PORT),
                     ),
                 ): int,
                 vol.Optional(
                     "payload",
-                    default=self.config_entry.options.get(
+                    default=self._entry.options.get(
                         "payload",
-                        self.config_entry.data.get("payload", DEFAULT_PAYLOAD),
+                        self._entry.data.get("payload", DEFAULT_PAYLOAD),
                     ),
                 ): str,
                 vol.Optional(
                     "update_interval",
-                    default=self.config_entry.options.get(
+                    default=self._entry.options.get(
                         "update_interval",
-                        self.config_entry.data.get(
+                        self._entry.data.get(
                             "update_interval", DEFAULT_UPDATE_INTERVAL
                         ),
                     ),
                 ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+                vol.Optional(
+                    "max_update_interval",
+                    default=self._entry.options.get(
+                        "max_update_interval",
+                        self._entry.data.get(
+                            "max_update_interval", DEFAULT_MAX_UPDATE_INTERVAL
+                        ),
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1)),
                 vol.Optional(
                     "timeout",
-                    default=self.config_entry.options.get(
+                    default=self._entry.options.get(
                         "timeout",
-                        self.config_entry.data.get("timeout", DEFAULT_TIMEOUT),
+                        self._entry.data.get("timeout", DEFAULT_TIMEOUT),
                     ),
                 ): vol.All(vol.Coerce(int), vol.Range(min=1)),
                 vol.Optional(
                     "data_valid_seconds",
-                    default=self.config_entry.options.get(
+                    default=self._entry.options.get(
                         "data_valid_seconds",
-                        self.config_entry.data.get(
+                        self._entry.data.get(
                             "data_valid_seconds", DEFAULT_DATA_VALID_SECONDS
                         ),
                     ),
                 ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+                vol.Optional(
+                    "persistent_connection",
+                    default=self._entry.options.get(
+                        "persistent_connection",
+                        self._entry.data.get(
+                            "persistent_connection", DEFAULT_PERSISTENT_CONNECTION
+                        ),
+                    ),
+                ): bool,
+                vol.Optional(
+                    "compact_master_state",
+                    default=self._entry.options.get(
+                        "compact_master_state",
+                        self._entry.data.get(
+                            "compact_master_state", DEFAULT_COMPACT_MASTER_STATE
+                        ),
+                    ),
+                ): bool,
+                vol.Optional(
+                    "history_window",
+                    default=self._entry.options.get(
+                        "history_window",
+                        self._entry.data.get(
+                            "history_window", DEFAULT_HISTORY_WINDOW
+                        ),
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0, max=1440)),
+                vol.Optional(
+                    "aggregate_interval",
+                    default=self._entry.options.get(
+                        "aggregate_interval",
+                        self._entry.data.get(
+                            "aggregate_interval", DEFAULT_AGGREGATE_INTERVAL
+                        ),
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0, max=3600)),
+                # Martwe strefy tylko w opcjach - domyślnie wyłączone
+                vol.Optional(
+                    "deadband_ph",
+                    default=self._entry.options.get(
+                        "deadband_ph", DEFAULT_DEADBAND_PH
+                    ),
+                ): vol.All(vol.Coerce(float), vol.Range(min=0, max=1)),
+                vol.Optional(
+                    "deadband_temp",
+                    default=self._entry.options.get(
+                        "deadband_temp", DEFAULT_DEADBAND_TEMP
+                    ),
+                ): vol.All(vol.Coerce(float), vol.Range(min=0, max=5)),
+                vol.Optional(
+                    "deadband_led",
+                    default=self._entry.options.get(
+                        "deadband_led", DEFAULT_DEADBAND_LED
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0, max=100)),
+                vol.Optional(
+                    "deadband_heartbeat",
+                    default=self._entry.options.get(
+                        "deadband_heartbeat", DEFAULT_DEADBAND_HEARTBEAT
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=10, max=86400)),
             }
         )
 
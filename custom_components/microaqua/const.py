@@ -1,10 +1,40 @@
-from datetime import timedelta
-
 DOMAIN = "microaqua"
 DEFAULT_PORT = 7963
 DEFAULT_PAYLOAD = "TCPSCP?"
 DEFAULT_TIMEOUT = 2
 DEFAULT_UPDATE_INTERVAL = 1
+# Równe update_interval = bez adaptacji
+DEFAULT_MAX_UPDATE_INTERVAL = DEFAULT_UPDATE_INTERVAL
 DEFAULT_DATA_VALID_SECONDS = 5
-DEFAULT_SCAN_INTERVAL = timedelta(seconds=DEFAULT_UPDATE_INTERVAL)
+DEFAULT_PERSISTENT_CONNECTION = True
+DEFAULT_COMPACT_MASTER_STATE = False
+# Okno historii próbek w pamięci (minuty, 0 = wyłączona)
+DEFAULT_HISTORY_WINDOW = 180
+# Przedział agregatów min/max/średnia (sekundy, 0 = wyłączone)
+DEFAULT_AGGREGATE_INTERVAL = 60
+# Martwa strefa publikacji (0 = każda zmiana) i maks. czas ciszy w sekundach
+DEFAULT_DEADBAND_PH = 0.0
+DEFAULT_DEADBAND_TEMP = 0.0
+DEFAULT_DEADBAND_LED = 0
+DEFAULT_DEADBAND_HEARTBEAT = 300
 DEFAULT_NAME = "microAQUA"
+# Podsieć proponowana do skanowania, gdy nie znamy adresu HA
+DEFAULT_SUBNET = "192.168.1.0/24"
+
+# Wspólny silnik odpytywania wszystkich sterowników (hass.data)
+DATA_ENGINE = f"{DOMAIN}_engine"
+MAX_CONCURRENT_POLLS = 16
+POLL_JITTER = 0.1
+
+# Usługa microaqua.profile
+SERVICE_PROFILE = "profile"
+DEFAULT_PROFILE_DURATION = 60
+DEFAULT_PROFILE_TOP = 30
+
+# Historia próbek: komenda websocket i usługa
+WS_TYPE_HISTORY = f"{DOMAIN}/history"
+SERVICE_GET_HISTORY = "get_history"
+
+# Usługa microaqua.send_commands: komendy AT w jednej paczce
+SERVICE_SEND_COMMANDS = "send_commands"
+MAX_BATCH_COMMANDS = 20
@@ -0,0 +1,574 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import re
+import socket
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional
+
+from homeassistant.core import callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.util import dt as dt_util
+from homeassistant.util import slugify
+
+from .client import PRIORITY_COMMAND, FrameError, MicroAQUAClient, RequestSkipped
+from .aggregate import AGGREGATE_CONTEXT, IntervalAggregator
+from .const import (
+    DOMAIN,
+    DEFAULT_AGGREGATE_INTERVAL,
+    DEFAULT_HISTORY_WINDOW,
+    DEFAULT_PERSISTENT_CONNECTION,
+)
+from .decoder import EMPTY_SNAPSHOT, FIELD_COUNT, MicroAQUASnapshot, decode_frame
+from .history import SampleHistory
+from .profiler import DATA_PROFILING
+from .stats import MicroAQUAStats
+
+_LOGGER = logging.getLogger(__name__)
+
+# Zegar urządzenia (pole 19) zmienia się co sekundę - nie świadczy o zmianie
+_CLOCK_INDEX = 19
+
+# Szum pomiarowy (pH, temperatury), który nie przyspiesza odpytywania
+_STABLE_TOLERANCE = {0: 0.02, 1: 0.1, 2: 0.1, 3: 0.1, 4: 0.1}
+
+# Wirtualny indeks pola "wiek danych" - kontekst encji Data valid / Data age
+AGE_FIELD = FIELD_COUNT + 2
+AGE_CONTEXT = frozenset({AGE_FIELD})
+
+# Odpowiedzi sterownika na komendy
+_REPLY_OK = b"OK"
+_REPLY_ERROR = b"ERROR"
+
+# Stan widoczny w UI (przełączniki) dla pól zmienianych komendami;
+# potwierdzenie komendy porównuje ten stan, a nie dokładną wartość
+_COMMAND_STATE: dict[int, Callable[[int], bool]] = {
+    17: lambda value: value != 0,
+    18: lambda value: not value & 128 and bool(value & 127),
+}
+
+# Wirtualny indeks "czas bez regulacji do wysłania" (encja number, nie payload)
+NO_REG_SET_FIELD = FIELD_COUNT + 3
+NO_REG_SET_CONTEXT = frozenset({NO_REG_SET_FIELD})
+
+# Sekcja profilowana, gdy microaqua.profile nie działa
+_NOT_PROFILED = contextlib.nullcontext()
+
+
+def _derive_entity_prefix(name: str) -> str:
+    if not name:
+        return "uaqua_1"
+    match = re.search(r"microaqua\s*(\d+)", name, re.IGNORECASE)
+    if match:
+        return f"uaqua_{match.group(1)}"
+    return slugify(name)
+
+
+class MicroAQUACoordinator(DataUpdateCoordinator):
+    """Owns the poll loop: connects, polls and decodes the microAQUA payload.
+
+    ``data`` is the MicroAQUASnapshot of the last valid frame.
+
+    One instance per config entry; every sensor, switch and number entity
+    listens to it, so one network read means one fan-out. Listeners pass
+    the payload indices they read as their context and are only called
+    when one of those fields changed.
+
+    Polls are scheduled by the shared MicroAQUAPollEngine from
+    ``poll_interval``. With ``max_update_interval`` above
+    ``update_interval`` the poll rate adapts: every stable poll doubles
+    the interval up to the ceiling, any real change (value beyond noise,
+    alarm register, socket state), error or user command drops it back
+    to ``update_interval``.
+
+    Commands answered with ``OK`` are applied to the snapshot at once
+    (fields 17/18) and confirmed - or rolled back - by the first poll
+    sent after them, so a switch needs no extra poll round-trip.
+
+    Freshness is a cached flag: every valid frame pushes the expiry
+    forward and one timer flips the flag exactly when the data gets
+    older than ``data_valid_seconds``, writing all entities in one batch.
+    """
+
+    def __init__(
+        self,
+        hass,
+        ip,
+        port,
+        payload,
+        name,
+        *,
+        update_interval: int,
+        timeout: int,
+        data_valid_seconds: int,
+        persistent_connection: bool = DEFAULT_PERSISTENT_CONNECTION,
+        max_update_interval: Optional[int] = None,
+        history_window: int = DEFAULT_HISTORY_WINDOW,
+        aggregate_interval: int = DEFAULT_AGGREGATE_INTERVAL,
+    ):
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=f"{DOMAIN} {name}",
+            # Harmonogram prowadzi MicroAQUAPollEngine (engine.py), nie własny timer
+            update_interval=None,
+        )
+        self._display_name = name  # nazwa urządzenia z config flow
+        self._entity_prefix = _derive_entity_prefix(name)
+        self._ip = ip
+        self._port = port
+        self._payload = f"AT+{payload}\r\n"
+        self._expected_prefix = f"AT+{payload}=".encode("utf-8")
+        self._timeout = timeout
+        self._data_valid_seconds = data_valid_seconds
+        self._min_interval = timedelta(seconds=update_interval)
+        self._max_interval = timedelta(
+            seconds=max(max_update_interval or update_interval, update_interval)
+        )
+        self.poll_interval = self._min_interval
+        # Ostatnia ramka uznana za zmianę; punkt odniesienia dla stabilności
+        self._stable_reference: MicroAQUASnapshot = EMPTY_SNAPSHOT
+        # Ustawiane przez MicroAQUAPollEngine.async_register
+        self.poll_engine = None
+        self.stats = MicroAQUAStats()
+        # Jedna próbka na odczyt; pojemność liczona dla najkrótszego interwału
+        self.history: Optional[SampleHistory] = (
+            SampleHistory(max(history_window * 60 // update_interval, 1))
+            if history_window
+            else None
+        )
+        self.aggregator: Optional[IntervalAggregator] = (
+            IntervalAggregator(aggregate_interval) if aggregate_interval else None
+        )
+        self._client = MicroAQUAClient(
+            ip, port, timeout=timeout, persistent=persistent_connection, stats=self.stats
+        )
+
+        self._state: Optional[str] = None
+        self._error_count = 0
+        self._last_update_dt: Optional[datetime] = None
+        # Świeżość danych: flaga + termin ważności (loop.time()) + jeden timer
+        self._data_fresh = False
+        self._fresh_until = 0.0
+        self._expiry_handle: Optional[asyncio.TimerHandle] = None
+        self._snapshot: MicroAQUASnapshot = EMPTY_SNAPSHOT
+        # Indeksy pól zmienionych w ostatniej ramce; None = powiadom wszystkich
+        self._changed_indices: Optional[frozenset[int]] = None
+        # Pola komend czekające na potwierdzenie: indeks -> (loop.time() wysłania, wartość)
+        self._pending_fields: dict[int, tuple[float, str]] = {}
+
+        # Value used by number.py (No regulation time set, minutes)
+        self._no_reg_set_minutes: int = 0
+
+        # Kluczowe: nazwa urządzenia krótka, bez IP/port (żeby UI nie puchło)
+        self._device_info = {
+            "identifiers": {(DOMAIN, self._entity_prefix)},
+            "name": self._display_name,
+            "manufacturer": "microAQUA",
+            "model": "microAQUA",
+        }
+
+    @property
+    def state(self):
+        return self._state
+
+    @property
+    def available(self) -> bool:
+        return self._state not in (None, "unknown", "unavailable")
+
+    @property
+    def snapshot(self) -> MicroAQUASnapshot:
+        return self._snapshot
+
+    @property
+    def no_reg_set_minutes(self) -> int:
+        """Minutes sent with AT+TCPENRM (set by the number entity)."""
+        return self._no_reg_set_minutes
+
+    @property
+    def poll_deadline(self) -> float:
+        """Seconds a single poll (connect + exchange) may take."""
+        return 2 * self._timeout
+
+    @property
+    def error_count(self) -> int:
+        """Failed polls in a row."""
+        return self._error_count
+
+    @property
+    def device_info(self):
+        return self._device_info
+
+    @property
+    def display_name(self) -> str:
+        return self._display_name
+
+    @property
+    def entity_prefix(self) -> str:
+        return self._entity_prefix
+
+    def data_age_seconds(self) -> Optional[float]:
+        if self._state in (None, "unknown", "unavailable"):
+            return None
+        if self._last_update_dt is None:
+            return None
+        return (dt_util.utcnow() - self._last_update_dt).total_seconds()
+
+    def has_recent_data(self) -> bool:
+        # Flaga przełączana przez timer - bez liczenia wieku przy każdym odczycie
+        return self._data_fresh and self.available
+
+    def parts_length(self) -> int:
+        return self._snapshot.length
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Notify only the listeners whose source fields changed."""
+        changed = self._changed_indices
+        if changed is not None and not changed:
+            return
+        with self._profiled():
+            for update_callback, context in list(self._listeners.values()):
+                if changed is None or context is None or not changed.isdisjoint(context):
+                    update_callback()
+
+    async def async_send_command(self, command: str) -> None:
+        """Send a raw command to device (adds CRLF). Used by switch.py.
+
+        ``OK`` applies the expected result optimistically, ``ERROR``
+        raises HomeAssistantError; without a reply the next poll shows
+        the outcome.
+        """
+        self.stats.commands += 1
+        # Następna ramka liczy się jako zmiana - kilka odczytów po komendzie idzie szybko
+        self._stable_reference = EMPTY_SNAPSHOT
+        self._poll_fast()
+        if self.poll_engine is not None:
+            self.poll_engine.async_reschedule(self)
+        sent_at = self.hass.loop.time()
+        try:
+            reply = await self._client.async_request(
+                f"{command}\r\n",
+                priority=PRIORITY_COMMAND,
+                ignore=self._expected_prefix,
+            )
+        except (socket.timeout, asyncio.TimeoutError):
+            # Urządzenie nie zawsze odpowiada na komendy
+            return
+        reply = reply.strip().upper()
+        if reply == _REPLY_ERROR:
+            raise HomeAssistantError(f"{command} rejected by the device")
+        if reply == _REPLY_OK:
+            self._apply_optimistic(sent_at, self._expected_fields(command))
+        else:
+            _LOGGER.debug("Unexpected reply to %s: %r", command, reply)
+
+    async def async_send_commands(self, commands: list[str]) -> list[dict[str, Any]]:
+        """Send commands in order over one connection (microaqua.send_commands).
+
+        Same semantics as async_send_command: ``ok`` is set only for an
+        ``OK`` reply, a command without a reply is unconfirmed and the batch
+        goes on, and only ``ERROR`` or a connection failure stops it (the
+        result then has ``error``). Accepted switch commands are applied
+        optimistically; if any other command was sent, or one was not
+        confirmed, the state is refreshed once at the end. Returns one
+        result per command sent.
+        """
+        self._stable_reference = EMPTY_SNAPSHOT
+        self._poll_fast()
+        if self.poll_engine is not None:
+            self.poll_engine.async_reschedule(self)
+        sent_at = self.hass.loop.time()
+        replies = await self._client.async_request_batch(
+            [f"{command}\r\n" for command in commands],
+            stop=lambda reply: reply.strip().upper() == _REPLY_ERROR,
+            ignore=self._expected_prefix,
+        )
+        self.stats.commands += len(replies)
+
+        results: list[dict[str, Any]] = []
+        expected: dict[int, str] = {}
+        refresh = False
+        for command, reply in zip(commands, replies):
+            if isinstance(reply, (socket.timeout, asyncio.TimeoutError)):
+                # Urządzenie nie zawsze odpowiada na komendy - skutek pokaże odczyt
+                results.append({"command": command, "ok": False, "reply": None})
+                refresh = True
+                continue
+            if isinstance(reply, Exception):
+                results.append(
+                    {"command": command, "ok": False, "error": str(reply) or repr(reply)}
+                )
+                refresh = True
+                break
+            reply = reply.strip()
+            result = {
+                "command": command,
+                "ok": reply.upper() == _REPLY_OK,
+                "reply": reply.decode("utf-8", "replace"),
+            }
+            if reply.upper() == _REPLY_ERROR:
+                result["error"] = "rejected by the device"
+            elif not result["ok"]:
+                _LOGGER.debug("Unexpected reply to %s: %r", command, reply)
+            results.append(result)
+            fields = self._expected_fields(command) if result["ok"] else {}
+            if fields:
+                expected.update(fields)
+            else:
+                # Skutek nieznany (inna komenda albo błąd) - jeden odczyt na końcu
+                refresh = True
+
+        if expected:
+            self._apply_optimistic(sent_at, expected)
+        if refresh:
+            await self.async_refresh()
+        return results
+
+    @callback
+    def async_set_no_reg_set_minutes(self, minutes: int) -> None:
+        """Store the minutes and notify only the entities that show them."""
+        if minutes == self._no_reg_set_minutes:
+            return
+        self._no_reg_set_minutes = minutes
+        self._changed_indices = NO_REG_SET_CONTEXT
+        self.async_update_listeners()
+
+    async def async_close(self) -> None:
+        """Stop polling and close the connection (entry unload).
+
+        Cancels a poll still in flight, the refresh debouncer and the
+        client worker, so nothing keeps a reference to this coordinator.
+        """
+        if self.poll_engine is not None:
+            self.poll_engine.async_unregister(self)
+        if self._expiry_handle is not None:
+            self._expiry_handle.cancel()
+            self._expiry_handle = None
+        await self.async_shutdown()
+        await self._client.async_close()
+
+    async def _async_update_data(self):
+        self.stats.polls += 1
+        started = self.hass.loop.time()
+        try:
+            valid_data = await self._fetch_data()
+            with self._profiled():
+                return self._process_frame(valid_data, started)
+
+        except RequestSkipped:
+            # Odczyt czekał w kolejce za komendami - to nie błąd urządzenia
+            _LOGGER.debug("Poll of %s skipped behind a command", self._display_name)
+            self._changed_indices = frozenset()
+            return self._snapshot
+        except FrameError as e:
+            _LOGGER.warning("Invalid response from device: %s", e)
+            self.stats.invalid_frames += 1
+            return self._handle_error()
+        except (socket.timeout, asyncio.TimeoutError):
+            _LOGGER.warning("Timeout while connecting to %s:%s", self._ip, self._port)
+            self.stats.timeouts += 1
+            return self._handle_error()
+        except (socket.error, socket.gaierror) as e:
+            _LOGGER.error("TCP connection error: %s", e)
+            self.stats.connection_errors += 1
+            return self._handle_error()
+        except Exception as e:
+            _LOGGER.error("Unexpected error: %s", e)
+            return self._handle_error()
+
+    def _process_frame(self, valid_data: str, started: float) -> MicroAQUASnapshot:
+        """Decode a fetched frame and work out which fields changed."""
+        if not valid_data:
+            _LOGGER.warning("Empty response from device")
+            return self._handle_error()
+
+        if self._pending_fields:
+            valid_data = self._resolve_command(valid_data, started)
+
+        self._last_update_dt = dt_util.utcnow()
+        # Po przeterminowaniu (albo na starcie) zapisujemy wszystkie encje
+        was_fresh = self.has_recent_data()
+        self._error_count = 0
+
+        if valid_data == self._state:
+            # Ramka identyczna z poprzednią - bez dekodowania i bez zapisów stanu
+            self._changed_indices = frozenset() if was_fresh else None
+            self._poll_slower()
+            self._mark_fresh()
+            self._record_sample()
+            return self._snapshot
+
+        snapshot = decode_frame(valid_data)
+        self._changed_indices = (
+            self._diff_parts(self._snapshot.parts, snapshot.parts)
+            if was_fresh
+            else None
+        )
+        self._snapshot = snapshot
+        self._state = valid_data
+        if self._is_significant_change(self._stable_reference, snapshot):
+            self._stable_reference = snapshot
+            self._poll_fast()
+        else:
+            self._poll_slower()
+        self._mark_fresh()
+        self._record_sample()
+        return snapshot
+
+    def _profiled(self):
+        """cProfile section while microaqua.profile runs, otherwise a no-op."""
+        return self.hass.data.get(DATA_PROFILING) or _NOT_PROFILED
+
+    async def _fetch_data(self) -> str:
+        """Poll the device; returns the payload after ``AT+<payload>=``."""
+        payload = await self._client.async_request(
+            self._payload, self._expected_prefix, deadline=self.poll_deadline
+        )
+        return payload.decode("utf-8", "replace")
+
+    def _record_sample(self) -> None:
+        """Feed the successful poll to the history ring and the aggregates."""
+        timestamp = self._last_update_dt.timestamp()
+        if self.history is not None:
+            self.history.add(timestamp, self._snapshot)
+        if self.aggregator is not None and self.aggregator.add(timestamp, self._snapshot):
+            # Zamknięty przedział - zapis encji agregatów
+            if self._changed_indices is not None:
+                self._changed_indices = self._changed_indices | AGGREGATE_CONTEXT
+
+    def _expected_fields(self, command: str) -> dict[int, str]:
+        """Payload fields an accepted command changes (as the device shows them)."""
+        name, _, arg = command.partition(";")
+        if name == "AT+TCPENRM" and arg.isdigit():
+            return {17: str(int(arg))}
+        if name == "AT+TCPLNRM":
+            return {17: "0"}
+        register = self._snapshot.alarm_register
+        if name == "AT+TCPTOA" and register is not None and register & 127:
+            return {18: str(register | 128)}
+        return {}
+
+    @callback
+    def _apply_optimistic(self, sent_at: float, expected: dict[int, str]) -> None:
+        """Show the accepted command's result now; the next poll confirms it."""
+        parts = self._snapshot.parts
+        expected = {
+            index: text
+            for index, text in expected.items()
+            if index < len(parts) and parts[index] != text
+        }
+        if not expected:
+            return
+        # Kolejna komenda przed odczytem dokłada swoje pola, nie zastępuje
+        for index, text in expected.items():
+            self._pending_fields[index] = (sent_at, text)
+        self._snapshot = self._snapshot.replace(expected)
+        self._state = self._snapshot.raw
+        self._changed_indices = frozenset(expected)
+        self.async_update_listeners()
+
+    def _resolve_command(self, frame: str, started: float) -> str:
+        """Confirm or roll back the pending fields against a polled frame."""
+        parts = frame.split(";")
+        overlaid = False
+        for index, (sent_at, text) in list(self._pending_fields.items()):
+            if started < sent_at:
+                # Odczyt sprzed komendy - pokazuje stary stan, optymistyczne pole zostaje
+                if index < len(parts):
+                    parts[index] = text
+                    overlaid = True
+                continue
+
+            del self._pending_fields[index]
+            state = _COMMAND_STATE[index]
+            try:
+                confirmed = state(int(parts[index])) == state(int(text))
+            except (IndexError, ValueError):
+                confirmed = False
+            if not confirmed:
+                # Zwykła ramka nadpisze optymistyczne pole - to jest wycofanie
+                self.stats.command_rollbacks += 1
+                _LOGGER.warning(
+                    "%s did not apply the last command (field %s)",
+                    self._display_name,
+                    index,
+                )
+        return ";".join(parts) if overlaid else frame
+
+    def _valid_extension(self) -> float:
+        # Przy wydłużonym interwale dane nie starzeją się szybciej niż je odpytujemy
+        return (self.poll_interval - self._min_interval).total_seconds()
+
+    def _mark_fresh(self) -> None:
+        """Valid frame: push the expiry forward (the timer is armed only once)."""
+        loop = self.hass.loop
+        self._data_fresh = True
+        self._fresh_until = (
+            loop.time() + self._data_valid_seconds + self._valid_extension()
+        )
+        if self._expiry_handle is None:
+            self._expiry_handle = loop.call_at(self._fresh_until, self._async_expire)
+
+    @callback
+    def _async_expire(self) -> None:
+        """Timer: flip freshness once the newest frame is too old."""
+        self._expiry_handle = None
+        loop = self.hass.loop
+        if loop.time() < self._fresh_until:
+            # W międzyczasie przyszła nowa ramka - czekamy do nowego terminu
+            self._expiry_handle = loop.call_at(self._fresh_until, self._async_expire)
+            return
+        self._data_fresh = False
+        # Jedna paczka zapisów: wszystkie encje pokazują przeterminowanie
+        self._changed_indices = None
+        self.async_update_listeners()
+
+    def _handle_error(self):
+        """Count a failed poll; keep the last frame until 5 errors in a row."""
+        self._error_count += 1
+        self._poll_fast()
+        # Przeterminowanie zgłasza timer; tu tylko rośnie wiek danych
+        self._changed_indices = frozenset() if self.has_recent_data() else AGE_CONTEXT
+        if self._error_count >= 5:
+            if self.available:
+                self._changed_indices = None
+            self._state = "unknown"
+        return self._snapshot
+
+    @staticmethod
+    def _diff_parts(old: tuple[str, ...], new: tuple[str, ...]) -> Optional[frozenset[int]]:
+        """Indices that differ between two frames (None if the layout changed)."""
+        if len(old) != len(new):
+            return None
+        return frozenset(i for i, (a, b) in enumerate(zip(old, new)) if a != b)
+
+    def _poll_fast(self) -> None:
+        self.poll_interval = self._min_interval
+
+    def _poll_slower(self) -> None:
+        if self.poll_interval < self._max_interval:
+            self.poll_interval = min(self.poll_interval * 2, self._max_interval)
+
+    @staticmethod
+    def _is_significant_change(
+        reference: MicroAQUASnapshot, snapshot: MicroAQUASnapshot
+    ) -> bool:
+        """True if the frame differs from the reference beyond clock and noise."""
+        if reference.length != snapshot.length:
+            return True
+        for index in range(FIELD_COUNT):
+            if index == _CLOCK_INDEX:
+                continue
+            old, new = reference.value(index), snapshot.value(index)
+            if old == new:
+                continue
+            tolerance = _STABLE_TOLERANCE.get(index)
+            if tolerance is None or old is None or new is None:
+                return True
+            if abs(new - old) > tolerance + 1e-9:
+                return True
+        return False
@@ -0,0 +1,166 @@
+"""Field schema and decoder for the microAQUA status frame (AT+TCPSCP)."""
+from __future__ import annotations
+
+import datetime
+from typing import Any, Callable, NamedTuple, Optional
+
+
+def _to_int(value: str) -> Optional[int]:
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def _scaled(scale: float) -> Callable[[str], Optional[float]]:
+    def convert(value: str) -> Optional[float]:
+        try:
+            return float(value) / scale
+        except ValueError:
+            return None
+
+    return convert
+
+
+def _to_str(value: str) -> Optional[str]:
+    if value in ("", "???"):
+        return None
+    return value
+
+
+_to_ph = _scaled(100.0)
+_to_temp = _scaled(10.0)
+
+
+class Field(NamedTuple):
+    index: int
+    name: str
+    convert: Callable[[str], Any]
+
+
+# Jedno miejsce z układem ramki. Nowy firmware z innymi polami = zmiana tutaj.
+FIELDS: tuple[Field, ...] = (
+    Field(0, "ph", _to_ph),
+    Field(1, "temp1", _to_temp),
+    Field(2, "temp2", _to_temp),
+    Field(3, "temp3", _to_temp),
+    Field(4, "temp4", _to_temp),
+    Field(5, "fan_mode", _to_int),
+    Field(6, "fan_speed", _to_int),
+    Field(7, "thermoreg_socket", _to_int),
+    Field(8, "thermoreg_socket_state", _to_int),
+    Field(9, "co2_socket", _to_int),
+    Field(10, "co2_socket_state", _to_int),
+    Field(11, "o2_socket", _to_int),
+    Field(12, "o2_socket_state", _to_int),
+    Field(13, "led1", _to_int),
+    Field(14, "led2", _to_int),
+    Field(15, "led3", _to_int),
+    Field(16, "led4", _to_int),
+    Field(17, "no_reg_minutes", _to_int),
+    Field(18, "alarm_register", _to_int),
+    Field(19, "clock", _to_str),
+    Field(20, "alarm_temp_min", _to_temp),
+    Field(21, "alarm_temp_max", _to_temp),
+    Field(22, "alarm_temp_hysteresis", _to_temp),
+    Field(23, "alarm_ph_min", _to_ph),
+    Field(24, "alarm_ph_max", _to_ph),
+    Field(25, "alarm_ph_hysteresis", _to_ph),
+)
+
+FIELD_COUNT = len(FIELDS)
+FIELD_NAMES: tuple[str, ...] = tuple(f.name for f in FIELDS)
+
+# Plan dekodowania liczony raz przy imporcie
+_PLAN = tuple((f.name, f.index, f.convert) for f in FIELDS)
+
+# "brak przypisanego gniazda"
+SOCKET_UNASSIGNED = 7
+
+
+class MicroAQUASnapshot:
+    """Immutable, decoded view of one status frame.
+
+    Built once per poll by decode_frame(); entities only read attributes.
+    Fields missing from a shorter frame are None.
+    """
+
+    __slots__ = ("raw", "parts", "length") + FIELD_NAMES
+
+    raw: str
+    parts: tuple[str, ...]
+    length: int
+
+    ph: Optional[float]
+    temp1: Optional[float]
+    temp2: Optional[float]
+    temp3: Optional[float]
+    temp4: Optional[float]
+    fan_mode: Optional[int]
+    fan_speed: Optional[int]
+    thermoreg_socket: Optional[int]
+    thermoreg_socket_state: Optional[int]
+    co2_socket: Optional[int]
+    co2_socket_state: Optional[int]
+    o2_socket: Optional[int]
+    o2_socket_state: Optional[int]
+    led1: Optional[int]
+    led2: Optional[int]
+    led3: Optional[int]
+    led4: Optional[int]
+    no_reg_minutes: Optional[int]
+    alarm_register: Optional[int]
+    clock: Optional[str]
+    alarm_temp_min: Optional[float]
+    alarm_temp_max: Optional[float]
+    alarm_temp_hysteresis: Optional[float]
+    alarm_ph_min: Optional[float]
+    alarm_ph_max: Optional[float]
+    alarm_ph_hysteresis: Optional[float]
+
+    def __init__(self, raw: str, parts: tuple[str, ...]):
+        set_ = object.__setattr__
+        length = len(parts)
+        set_(self, "raw", raw)
+        set_(self, "parts", parts)
+        set_(self, "length", length)
+        for name, index, convert in _PLAN:
+            set_(self, name, convert(parts[index]) if index < length else None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def replace(self, changes: dict[int, str]) -> "MicroAQUASnapshot":
+        """Copy with some payload fields replaced (optimistic command state)."""
+        parts = list(self.parts)
+        for index, text in changes.items():
+            parts[index] = text
+        return MicroAQUASnapshot(";".join(parts), tuple(parts))
+
+    def value(self, index: int) -> Any:
+        """Decoded value by payload index (None if unknown/missing)."""
+        if index < FIELD_COUNT:
+            return getattr(self, FIELD_NAMES[index])
+        return None
+
+    @property
+    def device_time(self) -> Optional[datetime.time]:
+        """Device clock (field 19) as a time object, parsed on demand."""
+        if self.clock is None:
+            return None
+        try:
+            h, m, s = self.clock.split(":")
+            return datetime.time(int(h), int(m), int(s))
+        except ValueError:
+            return None
+
+
+EMPTY_SNAPSHOT = MicroAQUASnapshot("", ())
+
+
+def decode_frame(frame: str) -> MicroAQUASnapshot:
+    """Decode the payload of a status frame (text after ``AT+<payload>=``)."""
+    return MicroAQUASnapshot(frame, tuple(frame.split(";")))
@@ -0,0 +1,34 @@
+"""Diagnostics download for microAQUA (per controller)."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+TO_REDACT = {"ip"}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return connection/poll statistics of one controller."""
+    coordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
+    return {
+        "entry": {
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": async_redact_data(dict(entry.options), TO_REDACT),
+        },
+        "coordinator": {
+            "available": coordinator.available,
+            "error_count": coordinator.error_count,
+            "data_valid": coordinator.has_recent_data(),
+            "data_age_seconds": coordinator.data_age_seconds(),
+            "poll_interval_seconds": coordinator.poll_interval.total_seconds(),
+            "frame_fields": coordinator.parts_length(),
+        },
+        "stats": coordinator.stats.as_dict(),
+    }
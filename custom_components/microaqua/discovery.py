@@ -0,0 +1,95 @@
+"""LAN scan for microAQUA controllers (used by the config flow)."""
+from __future__ import annotations
+
+import asyncio
+import ipaddress
+import logging
+from typing import NamedTuple, Optional
+
+from .client import READ_SIZE, FrameBuffer, FrameError
+
+_LOGGER = logging.getLogger(__name__)
+
+# Równoległe próby połączenia; /24 mieści się w jednej "fali"
+SCAN_CONCURRENCY = 256
+# Czas na samo połączenie TCP (LAN odpowiada w ms, cisza = brak hosta)
+CONNECT_TIMEOUT = 0.8
+# Największa sieć do skanowania (/22 = 1022 adresy)
+MIN_PREFIX_LENGTH = 22
+
+
+class DiscoveredController(NamedTuple):
+    ip: str
+    fields: int
+
+
+def scan_hosts(subnet: str) -> list[str]:
+    """Host addresses of ``subnet`` (ValueError if invalid or too large)."""
+    network = ipaddress.ip_network(subnet, strict=False)
+    if network.version != 4 or network.prefixlen < MIN_PREFIX_LENGTH:
+        raise ValueError(f"Subnet must be IPv4 /{MIN_PREFIX_LENGTH} or smaller")
+    return [str(host) for host in network.hosts()]
+
+
+async def async_probe(
+    ip: str, port: int, payload: str, timeout: float
+) -> Optional[DiscoveredController]:
+    """Connect to ip:port and confirm it answers ``AT+<payload>`` like a controller.
+
+    One connection per host: the query goes over the stream that answered
+    the (short) connect, so the controller's small connection table sees a
+    single open/close.
+    """
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(ip, port), CONNECT_TIMEOUT
+        )
+    except (OSError, asyncio.TimeoutError):
+        return None
+
+    try:
+        writer.write(f"AT+{payload}\r\n".encode("utf-8"))
+        reply = await asyncio.wait_for(
+            _read_reply(reader, f"AT+{payload}=".encode("utf-8")), timeout
+        )
+    except (OSError, asyncio.TimeoutError, FrameError) as err:
+        _LOGGER.debug("%s:%s is open but not a microAQUA: %s", ip, port, err)
+        return None
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+    return DiscoveredController(ip, reply.count(b";") + 1)
+
+
+async def _read_reply(reader: asyncio.StreamReader, prefix: bytes) -> bytes:
+    buffer = FrameBuffer()
+    while (frame := buffer.pop_frame(prefix)) is None:
+        data = await reader.read(READ_SIZE)
+        if not data:
+            raise ConnectionResetError("Connection closed by device")
+        buffer.feed(data)
+    return frame
+
+
+async def async_scan(
+    subnet: str,
+    port: int,
+    payload: str,
+    timeout: float,
+    *,
+    concurrency: int = SCAN_CONCURRENCY,
+) -> list[DiscoveredController]:
+    """Probe every host of ``subnet`` concurrently; confirmed controllers only."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def probe(ip: str) -> Optional[DiscoveredController]:
+        async with semaphore:
+            return await async_probe(ip, port, payload, timeout)
+
+    results = await asyncio.gather(*(probe(ip) for ip in scan_hosts(subnet)))
+    found = [result for result in results if result is not None]
+    _LOGGER.debug("Scan of %s:%s found %s controller(s)", subnet, port, len(found))
+    return found
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+from functools import partial
+from typing import Optional
+
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import callback
+
+from .const import DATA_ENGINE, DOMAIN, MAX_CONCURRENT_POLLS, POLL_JITTER
+from .coordinator import MicroAQUACoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+# Złota proporcja - kolejne urządzenia startują równomiernie rozłożone w cyklu
+_GOLDEN_RATIO = 0.6180339887498949
+
+# Znacznik urządzenia, którego odczyt właśnie trwa
+_BUSY = -1
+
+
+class MicroAQUAPollEngine:
+    """Polls every configured controller from one scheduler loop.
+
+    Coordinators do not run their own timers. The engine keeps a heap of
+    due times, spreads start phases over the interval, adds jitter, caps
+    the number of polls in flight; each poll's deadline is enforced by the
+    client (MicroAQUAClient.async_request). A device whose poll is still
+    running is never polled a second time.
+    """
+
+    def __init__(
+        self,
+        hass,
+        *,
+        max_concurrency: int = MAX_CONCURRENT_POLLS,
+        jitter: float = POLL_JITTER,
+    ):
+        self._hass = hass
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._jitter = jitter
+        self._heap: list[tuple[float, int, MicroAQUACoordinator]] = []
+        self._seq = itertools.count()
+        # Numer jedynego ważnego wpisu w kopcu dla urządzenia (albo _BUSY)
+        self._entries: dict[MicroAQUACoordinator, int] = {}
+        self._phase = 0.0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # Trwające odczyty (anulowane przy wyrejestrowaniu urządzenia)
+        self._polls: dict[MicroAQUACoordinator, asyncio.Task] = {}
+        self._unsub_stop = None
+
+    @classmethod
+    @callback
+    def async_get(cls, hass) -> "MicroAQUAPollEngine":
+        """Shared engine of this Home Assistant instance (created on demand)."""
+        engine = hass.data.get(DATA_ENGINE)
+        if engine is None:
+            engine = hass.data[DATA_ENGINE] = cls(hass)
+        return engine
+
+    @callback
+    def async_register(self, coordinator: MicroAQUACoordinator) -> None:
+        """Start polling a coordinator, phase-shifted against the others."""
+        self._phase = (self._phase + _GOLDEN_RATIO) % 1.0
+        interval = coordinator.poll_interval.total_seconds()
+        coordinator.poll_engine = self
+        self._push(coordinator, self._hass.loop.time() + self._phase * interval)
+
+        if self._task is None:
+            self._task = self._hass.async_create_background_task(
+                self._run(), f"{DOMAIN} poll engine"
+            )
+            self._unsub_stop = self._hass.bus.async_listen_once(
+                EVENT_HOMEASSISTANT_STOP, self._async_handle_stop
+            )
+
+    @callback
+    def async_unregister(self, coordinator: MicroAQUACoordinator) -> None:
+        """Stop polling a coordinator; stops the loop with the last one."""
+        # Jego wpisy w kopcu przestają być ważne i zostaną pominięte
+        self._entries.pop(coordinator, None)
+        coordinator.poll_engine = None
+        task = self._polls.pop(coordinator, None)
+        if task is not None:
+            task.cancel()
+        if not self._entries:
+            self._async_stop()
+        elif len(self._heap) > 2 * len(self._entries):
+            # Częste przeładowania: nieważne wpisy trzymałyby stare koordynatory
+            self._heap = [
+                item for item in self._heap if self._entries.get(item[2]) == item[1]
+            ]
+            heapq.heapify(self._heap)
+
+    @callback
+    def async_reschedule(self, coordinator: MicroAQUACoordinator) -> None:
+        """Re-plan the next poll after the coordinator shortened its interval."""
+        entry = self._entries.get(coordinator)
+        if entry is None or entry == _BUSY:
+            # Trwający odczyt i tak zaplanuje następny z nowym interwałem
+            return
+        interval = coordinator.poll_interval.total_seconds()
+        self._push(coordinator, self._hass.loop.time() + interval)
+
+    async def _async_handle_stop(self, _event) -> None:
+        self._unsub_stop = None
+        self._async_stop()
+
+    @callback
+    def _async_stop(self) -> None:
+        if self._unsub_stop is not None:
+            self._unsub_stop()
+            self._unsub_stop = None
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for task in self._polls.values():
+            task.cancel()
+        self._polls.clear()
+        self._heap.clear()
+        if self._hass.data.get(DATA_ENGINE) is self:
+            del self._hass.data[DATA_ENGINE]
+
+    def _push(self, coordinator: MicroAQUACoordinator, due: float) -> None:
+        seq = next(self._seq)
+        self._entries[coordinator] = seq
+        heapq.heappush(self._heap, (due, seq, coordinator))
+        if self._heap[0][1] == seq:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        loop = self._hass.loop
+        while True:
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            due, seq, coordinator = self._heap[0]
+            delay = due - loop.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._heap)
+            if self._entries.get(coordinator) != seq:
+                continue
+            self._entries[coordinator] = _BUSY
+            task = self._hass.async_create_background_task(
+                self._poll(coordinator), f"{DOMAIN} poll {coordinator.name}"
+            )
+            self._polls[coordinator] = task
+            task.add_done_callback(partial(self._poll_done, coordinator))
+
+    def _poll_done(self, coordinator: MicroAQUACoordinator, task: asyncio.Task) -> None:
+        if self._polls.get(coordinator) is task:
+            del self._polls[coordinator]
+
+    async def _poll(self, coordinator: MicroAQUACoordinator) -> None:
+        loop = self._hass.loop
+        started = loop.time()
+        async with self._semaphore:
+            if coordinator not in self._entries:
+                return
+            # Termin (poll_deadline) pilnuje klient - przekroczenie to zwykły błąd odczytu
+            try:
+                await coordinator.async_refresh()
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Unexpected error polling %s", coordinator.name)
+
+        if coordinator not in self._entries:
+            return
+        # Rytm liczony od startu poprzedniego odczytu, z losowym odchyleniem
+        interval = coordinator.poll_interval.total_seconds()
+        interval *= 1 + random.uniform(-self._jitter, self._jitter)
+        self._push(coordinator, max(started + interval, loop.time()))
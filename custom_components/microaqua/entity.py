@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from typing import Iterable, Optional
+
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .coordinator import MicroAQUACoordinator
+
+
+class MicroAQUAEntity(CoordinatorEntity):
+    """Base class: attaches to device + listens to the coordinator (master).
+
+    ``fields`` are the payload indices the entity reads; it is only written
+    when one of them changes (or when availability/layout changes). None
+    means any change of the frame.
+    """
+
+    _attr_has_entity_name = False
+
+    def __init__(
+        self,
+        coordinator: MicroAQUACoordinator,
+        fields: Optional[Iterable[int]] = None,
+    ):
+        super().__init__(
+            coordinator, context=None if fields is None else frozenset(fields)
+        )
+        self._m = coordinator
+
+    @property
+    def device_info(self):
+        return self._m.device_info
+
+    @property
+    def available(self) -> bool:
+        return self._m.available
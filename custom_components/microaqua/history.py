@@ -0,0 +1,112 @@
+"""In-memory ring buffer of recent samples (pH, temperatures, LEDs)."""
+from __future__ import annotations
+
+import bisect
+from array import array
+from typing import Any, Optional
+
+from .decoder import MicroAQUASnapshot
+
+# (indeks pola, nazwa, dzielnik) - wartości trzymane tak, jak wysyła je sterownik
+HISTORY_FIELDS: tuple[tuple[int, str, int], ...] = (
+    (0, "ph", 100),
+    (1, "temp1", 10),
+    (2, "temp2", 10),
+    (3, "temp3", 10),
+    (4, "temp4", 10),
+    (13, "led1", 1),
+    (14, "led2", 1),
+    (15, "led3", 1),
+    (16, "led4", 1),
+)
+
+# Brak wartości w ramce (pole puste, krótsza ramka, wartość spoza zakresu)
+MISSING = -(2**31)
+# Największa wartość mieszcząca się w array("i")
+_MAX_FIXED = 2**31 - 1
+
+
+def _to_fixed(parts: tuple[str, ...], index: int) -> int:
+    if index >= len(parts):
+        return MISSING
+    try:
+        value = int(parts[index])
+    except ValueError:
+        return MISSING
+    # Uszkodzone pole nie może przerwać całego odczytu (OverflowError w array)
+    return value if MISSING < value <= _MAX_FIXED else MISSING
+
+
+class _Ordered:
+    """Read-only view of the ring in time order (for bisect)."""
+
+    __slots__ = ("_data", "_start", "_size", "_capacity")
+
+    def __init__(self, data: array, start: int, size: int, capacity: int):
+        self._data = data
+        self._start = start
+        self._size = size
+        self._capacity = capacity
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, i: int) -> int:
+        return self._data[(self._start + i) % self._capacity]
+
+
+class SampleHistory:
+    """Fixed-size ring of (timestamp, fixed-point values) per poll.
+
+    Backed by ``array`` columns: 8 bytes of timestamp (ms since epoch) and
+    4 bytes per field and sample, no Python objects per sample. The
+    oldest sample is overwritten when the ring is full.
+    """
+
+    __slots__ = ("capacity", "_times", "_columns", "_next", "_size", "_last_snapshot", "_last_row")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._times = array("q", bytes(8 * capacity))
+        self._columns = tuple(array("i", bytes(4 * capacity)) for _ in HISTORY_FIELDS)
+        self._next = 0
+        self._size = 0
+        self._last_snapshot: Optional[MicroAQUASnapshot] = None
+        self._last_row: tuple[int, ...] = ()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, timestamp: float, snapshot: MicroAQUASnapshot) -> None:
+        """Store one sample; the same snapshot is converted only once."""
+        if snapshot is not self._last_snapshot:
+            parts = snapshot.parts
+            self._last_row = tuple(_to_fixed(parts, index) for index, _, _ in HISTORY_FIELDS)
+            self._last_snapshot = snapshot
+        pos = self._next
+        self._times[pos] = int(timestamp * 1000)
+        for column, value in zip(self._columns, self._last_row):
+            column[pos] = value
+        self._next = (pos + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+
+    def query(self, start: Optional[float] = None, end: Optional[float] = None) -> dict[str, Any]:
+        """Samples with ``start <= t <= end`` (epoch seconds), oldest first.
+
+        Values stay fixed-point; divide by ``scale`` for the real value.
+        Missing values are None.
+        """
+        first = (self._next - self._size) % self.capacity
+        times = _Ordered(self._times, first, self._size, self.capacity)
+        lo = 0 if start is None else bisect.bisect_left(times, int(start * 1000))
+        hi = self._size if end is None else bisect.bisect_right(times, int(end * 1000))
+
+        positions = [(first + i) % self.capacity for i in range(lo, hi)]
+        result: dict[str, Any] = {
+            "scale": {name: scale for _, name, scale in HISTORY_FIELDS},
+            "time": [self._times[p] / 1000 for p in positions],
+        }
+        for column, (_, name, _) in zip(self._columns, HISTORY_FIELDS):
+            result[name] = [None if (v := column[p]) == MISSING else v for p in positions]
+        return result
@@ -5,17 +5,17 @@ from homeassistant.core import HomeAssistant
 from homeassistant.config_entries import ConfigEntry
 
 from .const import DOMAIN
+from .entity import MicroAQUAEntity
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities):
-    master = hass.data[DOMAIN][entry.entry_id]["master"]
-    async_add_entities([NoRegTimeMinutes(master)], True)
+    coordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
+    async_add_entities([NoRegTimeMinutes(coordinator)])
 
 
-class NoRegTimeMinutes(NumberEntity):
+class NoRegTimeMinutes(MicroAQUAEntity, NumberEntity):
     """Number: minutes for AT+TCPENRM;<minutes>."""
 
-    _attr_has_entity_name = False
     _attr_name = "Ustaw czas bez regulaji"
     _attr_native_min_value = 0
     _attr_native_max_value = 240
@@ -23,21 +23,18 @@ class NoRegTimeMinutes(NumberEntity):
     _attr_native_unit_of_measurement = "min"
     _attr_icon = "mdi:timer-cog"
 
-    def __init__(self, master):
-        self._m = master
+    def __init__(self, coordinator):
+        # Wartość nie pochodzi z payloadu - zapis tylko przy zmianie dostępności
+        super().__init__(coordinator, fields=())
         self._native_value = 0  # domyślnie
 
-        # Synchronizacja z masterem (switch korzysta z tej wartości)
-        self._m._no_reg_set_minutes = int(self._native_value)
+        # Synchronizacja z koordynatorem (switch korzysta z tej wartości)
+        self._m.async_set_no_reg_set_minutes(int(self._native_value))
 
     @property
     def unique_id(self) -> str:
         return f"{self._m.entity_prefix}_set_no_reg_time"
 
-    @property
-    def device_info(self):
-        return self._m.device_info
-
     @property
     def native_value(self):
         return self._native_value
@@ -45,7 +42,8 @@ class NoRegTimeMinutes(NumberEntity):
     async def async_set_native_value(self, value: float) -> None:
         self._native_value = int(round(value))
 
-        # KLUCZOWE: switch.py czyta to bezpośrednio
-        self._m._no_reg_set_minutes = int(self._native_value)
+        # KLUCZOWE: switch.py czyta to z koordynatora; atrybut mastera
+        # odświeża się przez ten sam mechanizm kontekstów co pola payloadu
+        self._m.async_set_no_reg_set_minutes(self._native_value)
 
         self.async_write_ha_state()
@@ -0,0 +1,147 @@
+"""On-demand profiling of the integration (microaqua.profile service)."""
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import io
+import logging
+import pstats
+import time
+import tracemalloc
+
+from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.exceptions import HomeAssistantError
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+# Klucz w hass.data - trwający ScopedProfiler (drugie wywołanie jest odrzucane)
+DATA_PROFILING = f"{DOMAIN}_profiling"
+
+# Ramki stosu zapisywane przez tracemalloc dla każdej alokacji (tylko miejsce)
+TRACEMALLOC_FRAMES = 1
+
+
+class ScopedProfiler:
+    """cProfile that only runs inside ``with profiler:`` sections.
+
+    The coordinators enter it around frame processing (decode, diff) and
+    the listener fan-out, so the rest of Home Assistant sharing the event
+    loop is not profiled. Sections may nest.
+    """
+
+    def __init__(self) -> None:
+        self.profile = cProfile.Profile()
+        self.sections = 0
+        self._depth = 0
+
+    def __enter__(self) -> "ScopedProfiler":
+        self._depth += 1
+        if self._depth == 1:
+            self.sections += 1
+            self.profile.enable()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            self.profile.disable()
+
+
+async def async_handle_profile(hass: HomeAssistant, call: ServiceCall) -> None:
+    """Profile this integration for ``duration`` seconds and write the results.
+
+    cProfile is switched on only inside the coordinators' poll processing
+    and fan-out sections (see ScopedProfiler); tracemalloc records one
+    frame per allocation for the duration of the call. Nothing is paid
+    while no profile is running. The full profile goes to
+    ``microaqua_profile_<ts>.prof`` and a summary plus the allocation
+    top-list to ``microaqua_profile_<ts>.txt`` in the config directory.
+    """
+    if hass.data.get(DATA_PROFILING):
+        raise HomeAssistantError("microAQUA profiling is already running")
+
+    duration = call.data["duration"]
+    top = call.data["top"]
+    stamp = time.strftime("%Y%m%d_%H%M%S")
+    prof_path = hass.config.path(f"{DOMAIN}_profile_{stamp}.prof")
+    text_path = hass.config.path(f"{DOMAIN}_profile_{stamp}.txt")
+
+    scoped = ScopedProfiler()
+    try:
+        with scoped:
+            pass
+    except ValueError as err:
+        # Inny profiler (np. integracja profiler) już działa w tym wątku
+        raise HomeAssistantError(f"Cannot start cProfile: {err}") from err
+    scoped.sections = 0
+
+    hass.data[DATA_PROFILING] = scoped
+    own_tracemalloc = not tracemalloc.is_tracing()
+    if own_tracemalloc:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    _LOGGER.warning("microAQUA profiling started for %s s", duration)
+    try:
+        await asyncio.sleep(duration)
+    finally:
+        hass.data.pop(DATA_PROFILING, None)
+        # Migawka przy wielu śladach trwa setki ms - poza pętlą zdarzeń
+        snapshot = await hass.async_add_executor_job(
+            _take_snapshot, own_tracemalloc
+        )
+
+    await hass.async_add_executor_job(
+        _write_results,
+        scoped.profile,
+        snapshot,
+        prof_path,
+        text_path,
+        duration,
+        scoped.sections,
+        top,
+    )
+    _LOGGER.warning("microAQUA profile written to %s and %s", prof_path, text_path)
+
+
+def _take_snapshot(stop: bool) -> tracemalloc.Snapshot:
+    snapshot = tracemalloc.take_snapshot()
+    if stop:
+        tracemalloc.stop()
+    return snapshot
+
+
+def _write_results(
+    profiler: cProfile.Profile,
+    snapshot: tracemalloc.Snapshot,
+    prof_path: str,
+    text_path: str,
+    duration: float,
+    sections: int,
+    top: int,
+) -> None:
+    profiler.dump_stats(prof_path)
+
+    out = io.StringIO()
+    out.write(f"microAQUA profile, {duration} s, {sections} profiled sections\n\n")
+    out.write("== cProfile: integration functions by cumulative time ==\n")
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(f"/{DOMAIN}/", top)
+
+    out.write(f"== tracemalloc: top {top} allocation sites (live at the end) ==\n")
+    snapshot = snapshot.filter_traces(
+        (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        )
+    )
+    for stat in snapshot.statistics("lineno")[:top]:
+        out.write(f"{stat}\n")
+
+    out.write(f"\n== tracemalloc: top {top} allocation sites in {DOMAIN} ==\n")
+    own = snapshot.filter_traces((tracemalloc.Filter(True, f"*/{DOMAIN}/*"),))
+    for stat in own.statistics("lineno")[:top]:
+        out.write(f"{stat}\n")
+
+    with open(text_path, "w", encoding="utf-8") as file:
+        file.write(out.getvalue())
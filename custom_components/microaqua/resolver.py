@@ -0,0 +1,96 @@
+"""Per-device host name cache for the TCP client."""
+from __future__ import annotations
+
+import asyncio
+import ipaddress
+import logging
+import socket
+from typing import Optional
+
+from .stats import MicroAQUAStats
+
+_LOGGER = logging.getLogger(__name__)
+
+# Jak długo ufamy odpowiedzi DNS (adres sterownika w LAN zmienia się rzadko)
+RESOLVE_TTL = 300
+# Jak długo pamiętamy błąd - bez pytania resolvera przy każdym odczycie
+NEGATIVE_TTL = 30
+
+
+class HostResolver:
+    """Resolves one host name, caches the result and orders the addresses.
+
+    IP literals are returned as is. A name is looked up at most once per
+    ``ttl`` seconds, a failed lookup is remembered for ``negative_ttl``
+    seconds, and when a refresh fails the previous addresses are kept.
+    The address that last connected is tried first, one that failed is
+    moved to the end (failover for names with several A/AAAA records).
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        *,
+        ttl: float = RESOLVE_TTL,
+        negative_ttl: float = NEGATIVE_TTL,
+        stats: Optional[MicroAQUAStats] = None,
+    ):
+        self._host = host
+        self._port = port
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+        self._addresses: list[str] = []
+        self._expires = 0.0
+        self._error: Optional[OSError] = None
+        self.stats = stats if stats is not None else MicroAQUAStats()
+        try:
+            ipaddress.ip_address(host)
+        except ValueError:
+            self._literal = False
+        else:
+            self._literal = True
+            self._addresses = [host]
+
+    async def async_addresses(self) -> list[str]:
+        """Addresses to try, best first (raises the cached lookup error)."""
+        if self._literal:
+            return self._addresses
+        loop = asyncio.get_running_loop()
+        if loop.time() < self._expires:
+            if self._error is not None:
+                raise self._error
+            return self._addresses
+
+        self.stats.dns_lookups += 1
+        try:
+            infos = await loop.getaddrinfo(
+                self._host, self._port, type=socket.SOCK_STREAM
+            )
+        except OSError as err:
+            if self._addresses:
+                # DNS chwilowo nie działa - zostajemy przy znanych adresach
+                _LOGGER.debug(
+                    "Lookup of %s failed, keeping %s: %s", self._host, self._addresses, err
+                )
+                self._expires = loop.time() + self._negative_ttl
+                return self._addresses
+            self._error = err
+            self._expires = loop.time() + self._negative_ttl
+            raise
+
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        # Sprawdzony adres zostaje na początku, jeśli nadal jest w odpowiedzi
+        if self._addresses and self._addresses[0] in addresses:
+            addresses.remove(self._addresses[0])
+            addresses.insert(0, self._addresses[0])
+        self._addresses = addresses
+        self._error = None
+        self._expires = loop.time() + self._ttl
+        return addresses
+
+    def mark_failed(self, address: str) -> None:
+        """Connecting to ``address`` failed - try the others first next time."""
+        if len(self._addresses) > 1 and address in self._addresses:
+            self._addresses.remove(address)
+            self._addresses.append(address)
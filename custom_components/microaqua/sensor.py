@@ -1,26 +1,27 @@
 from __future__ import annotations
 
-import asyncio
-import logging
-import re
-import socket
-from datetime import datetime, timedelta
-from typing import Optional
-
-from homeassistant.components.sensor import SensorEntity
+import abc
+from datetime import timedelta
+from typing import Any, Callable, Optional
+
+from homeassistant.components.sensor import SensorEntity, SensorStateClass
+from homeassistant.const import EntityCategory
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_call_later, async_track_time_interval
 from homeassistant.util import dt as dt_util
-from homeassistant.util import slugify
 
+from .aggregate import AGGREGATE_FIELD
 from .const import (
     DOMAIN,
-    DEFAULT_TIMEOUT,
-    DEFAULT_SCAN_INTERVAL,
-    DEFAULT_DATA_VALID_SECONDS,
-    DEFAULT_UPDATE_INTERVAL,
+    DEFAULT_COMPACT_MASTER_STATE,
+    DEFAULT_DEADBAND_PH,
+    DEFAULT_DEADBAND_TEMP,
+    DEFAULT_DEADBAND_LED,
+    DEFAULT_DEADBAND_HEARTBEAT,
 )
-
-_LOGGER = logging.getLogger(__name__)
-SCAN_INTERVAL = DEFAULT_SCAN_INTERVAL
+from .coordinator import AGE_FIELD, NO_REG_SET_FIELD, MicroAQUACoordinator
+from .decoder import SOCKET_UNASSIGNED
+from .entity import MicroAQUAEntity
 
 
 async def async_setup_entry(hass, config_entry, async_add_entities):
@@ -28,387 +29,208 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
     def _get_entry_value(key, default=None):
         return config_entry.options.get(key, config_entry.data.get(key, default))
 
-    ip = _get_entry_value("ip")
-    port = _get_entry_value("port")
-    payload = _get_entry_value("payload")
-    name = _get_entry_value("name")
-    update_interval = _get_entry_value("update_interval", DEFAULT_UPDATE_INTERVAL)
-    timeout = _get_entry_value("timeout", DEFAULT_TIMEOUT)
-    data_valid_seconds = _get_entry_value(
-        "data_valid_seconds", DEFAULT_DATA_VALID_SECONDS
-    )
-
-    master = MicroAQUASensor(
-        hass,
-        ip,
-        port,
-        payload,
-        name,
-        update_interval=update_interval,
-        timeout=timeout,
-        data_valid_seconds=data_valid_seconds,
+    coordinator: MicroAQUACoordinator = hass.data[DOMAIN][config_entry.entry_id][
+        "coordinator"
+    ]
+    compact_master_state = _get_entry_value(
+        "compact_master_state", DEFAULT_COMPACT_MASTER_STATE
     )
-
-    # Udostępnij mastera innym platformom (switch/number) przez hass.data
-    hass.data.setdefault(DOMAIN, {})
-    hass.data[DOMAIN].setdefault(config_entry.entry_id, {})
-    hass.data[DOMAIN][config_entry.entry_id]["master"] = master
+    heartbeat = _get_entry_value("deadband_heartbeat", DEFAULT_DEADBAND_HEARTBEAT)
+    ph_band = {
+        "deadband": _get_entry_value("deadband_ph", DEFAULT_DEADBAND_PH),
+        "heartbeat": heartbeat,
+    }
+    temp_band = {
+        "deadband": _get_entry_value("deadband_temp", DEFAULT_DEADBAND_TEMP),
+        "heartbeat": heartbeat,
+    }
+    led_band = {
+        "deadband": _get_entry_value("deadband_led", DEFAULT_DEADBAND_LED),
+        "heartbeat": heartbeat,
+    }
 
     async_add_entities(
         [
-            master,
+            MicroAQUASensor(coordinator, compact=compact_master_state),
 
             # --- podstawowe ---
-            DataValidSensor(master),
-            DataAgeSensor(master),
-            PHSensor(master),
-            TempSensor(master, "Czujnik Temperatury 1", 1, "hass:thermometer"),
-            TempSensor(master, "Czujnik Temperatury 2", 2, "hass:thermometer"),
-            TempSensor(master, "Czujnik Temperatury 3", 3, "hass:thermometer"),
-            TempSensor(master, "Czujnik Temperatury 4", 4, "hass:thermometer"),
-            LEDSensor(master, 1),
-            LEDSensor(master, 2),
-            LEDSensor(master, 3),
-            LEDSensor(master, 4),
-            LastUpdateTime(master),
+            DataValidSensor(coordinator),
+            DataAgeSensor(coordinator),
+            PHSensor(coordinator, **ph_band),
+            TempSensor(coordinator, "Czujnik Temperatury 1", 1, "hass:thermometer", **temp_band),
+            TempSensor(coordinator, "Czujnik Temperatury 2", 2, "hass:thermometer", **temp_band),
+            TempSensor(coordinator, "Czujnik Temperatury 3", 3, "hass:thermometer", **temp_band),
+            TempSensor(coordinator, "Czujnik Temperatury 4", 4, "hass:thermometer", **temp_band),
+            LEDSensor(coordinator, 1, **led_band),
+            LEDSensor(coordinator, 2, **led_band),
+            LEDSensor(coordinator, 3, **led_band),
+            LEDSensor(coordinator, 4, **led_band),
+            LastUpdateTime(coordinator),
 
             # --- progi temperatury (20..22 z payloadu) ---
-            AlarmTempMinValue(master),
-            AlarmTempMaxValue(master),
+            AlarmTempMinValue(coordinator),
+            AlarmTempMaxValue(coordinator),
 
             # --- statusy jak z YAML ---
-            NoRegTime(master),          # [17]
-            FanController(master),      # [5], [6], [17]
-            ThermoregSocket(master),    # [7], [8], [17]
-            CO2Socket(master),          # [9], [10], [17]
-            O2Socket(master),           # [11], [12], [17]
-
-            TempAlarms(master),         # [18]
-            PhAlarms(master),           # [18]
-            AcousticAlarmStatus(master),# [18]
-
-            AlarmPhMinValue(master),    # [23]
-            AlarmPhMaxValue(master),    # [24]
-
-        ],
-        True,
+            NoRegTime(coordinator),          # [17]
+            FanController(coordinator),      # [5], [6], [17]
+            ThermoregSocket(coordinator),    # [7], [8], [17]
+            CO2Socket(coordinator),          # [9], [10], [17]
+            O2Socket(coordinator),           # [11], [12], [17]
+
+            TempAlarms(coordinator),         # [18]
+            PhAlarms(coordinator),           # [18]
+            AcousticAlarmStatus(coordinator),# [18]
+
+            AlarmPhMinValue(coordinator),    # [23]
+            AlarmPhMaxValue(coordinator),    # [24]
+
+            # --- min/max/średnia z przedziału (pH, temperatury) ---
+            *(
+                AggregateSensor(coordinator, index, stat)
+                for index in (_AGGREGATE_LABELS if coordinator.aggregator else ())
+                for stat in ("min", "max", "mean")
+            ),
+
+            # --- diagnostyka (domyślnie wyłączone) ---
+            *(
+                DiagnosticSensor(coordinator, *description)
+                for description in _DIAGNOSTIC_SENSORS
+            ),
+        ]
     )
 
 
 # ---------------------- MASTER ENTITY ----------------------
 
-def _derive_entity_prefix(name: str) -> str:
-    if not name:
-        return "uaqua_1"
-    match = re.search(r"microaqua\s*(\d+)", name, re.IGNORECASE)
-    if match:
-        return f"uaqua_{match.group(1)}"
-    return slugify(name)
-
+class MicroAQUASensor(MicroAQUAEntity, SensorEntity):
+    """Master entity: raw payload as state, parsed values as attributes.
 
-class MicroAQUASensor(SensorEntity):
-    """Master entity: connects, polls and parses the microAQUA payload."""
+    In compact mode the state is only the connection status and the entity
+    is written only when one of the attribute fields changes, so the
+    recorder does not store the per-second raw frame.
+    """
 
-    _attr_has_entity_name = False
     _attr_icon = "mdi:raspberry-pi"
 
-    def __init__(
-        self,
-        hass,
-        ip,
-        port,
-        payload,
-        name,
-        *,
-        update_interval: int,
-        timeout: int,
-        data_valid_seconds: int,
-    ):
-        self._hass = hass
-        self._display_name = name  # nazwa urządzenia z config flow
-        self._entity_prefix = _derive_entity_prefix(name)
-        self._ip = ip
-        self._port = port
-        self._payload = f"AT+{payload}\r\n"
-        self._expected_prefix = f"AT+{payload}="
-        self._timeout = timeout
-        self._data_valid_seconds = data_valid_seconds
-
-        self._state: Optional[str] = None
-        self._error_count = 0
-        self._last_update_dt: Optional[datetime] = None
-        self._payload_parts: list[str] = []
-
-        # Value used by number.py (No regulation time set, minutes)
-        self._no_reg_set_minutes: int = 0
-
-        # podstawowe
-        self._ph_value = None
-        self._temp_values = [None] * 7
-        self._led = [None] * 4
-        self._last_update_time = None
-
-        # dodatkowe / YAML-like
-        self._fan_driver_mode = None              # [5]
-        self._fan_speed = None                    # [6]
-        self._thermoreg_assigned_socket = None    # [7]
-        self._thermoreg_socket_state = None       # [8]
-        self._ph_meter_assigned_co2_socket = None # [9]
-        self._ph_meter_co2_socket_state = None    # [10]
-        self._ph_meter_assigned_o2_socket = None  # [11]
-        self._ph_meter_o2_socket_state = None     # [12]
-        self._regulation_off_marker = None        # [17]
-        self._alarm_register = None               # [18]
-        self._alarm_temp_hysteresis = None        # [22]
-        self._alarm_ph_min = None                 # [23]
-        self._alarm_ph_max = None                 # [24]
-        self._alarm_ph_hysteresis = None          # [25]
-
-        self._attr_name = self._entity_prefix
-        self._attr_scan_interval = timedelta(seconds=update_interval)
-
-        # Kluczowe: nazwa urządzenia krótka, bez IP/port (żeby UI nie puchło)
-        self._attr_device_info = {
-            "identifiers": {(DOMAIN, self._entity_prefix)},
-            "name": self._display_name,
-            "manufacturer": "microAQUA",
-            "model": "microAQUA",
+    # Pola payloadu widoczne w atrybutach
+    _attribute_fields = (5, 6, 7, 9, 11, 17, 18, 20, 21, 22, 23, 24, 25)
+
+    # Prawie statyczne - nie ma sensu trzymać ich w historii
+    _unrecorded_attributes = frozenset(
+        {
+            "ip",
+            "port",
+            "alarm_temp_min_c",
+            "alarm_temp_max_c",
+            "alarm_temp_hysteresis_c",
+            "alarm_ph_min",
+            "alarm_ph_max",
+            "alarm_ph_hysteresis",
+            "thermoreg_assigned_socket",
+            "co2_assigned_socket",
+            "o2_assigned_socket",
+            "no_reg_set_minutes",
         }
+    )
+
+    def __init__(self, coordinator: MicroAQUACoordinator, *, compact: bool = False):
+        super().__init__(
+            coordinator,
+            (*self._attribute_fields, NO_REG_SET_FIELD) if compact else None,
+        )
+        self._compact = compact
+        self._attr_name = self._m.entity_prefix
 
     @property
     def unique_id(self):
-        return self._entity_prefix
+        return self._m.entity_prefix
 
     @property
     def state(self):
-        return self._state
-
-    @property
-    def available(self) -> bool:
-        return self._state not in (None, "unknown", "unavailable")
-
-    @property
-    def display_name(self) -> str:
-        return self._display_name
-
-    @property
-    def entity_prefix(self) -> str:
-        return self._entity_prefix
-
-    def data_age_seconds(self) -> Optional[float]:
-        if self._state in (None, "unknown", "unavailable"):
-            return None
-        if self._last_update_dt is None:
-            return None
-        return (dt_util.utcnow() - self._last_update_dt).total_seconds()
-
-    def has_recent_data(self, max_age_seconds: Optional[int] = None) -> bool:
-        age = self.data_age_seconds()
-        if max_age_seconds is None:
-            max_age_seconds = self._data_valid_seconds
-        return age is not None and age < max_age_seconds
-
-    def get_part(self, idx: int) -> Optional[str]:
-        return self._payload_parts[idx] if idx < len(self._payload_parts) else None
-
-    def parts_length(self) -> int:
-        return len(self._payload_parts)
+        if self._compact:
+            return "online" if self._m.available else self._m.state
+        return self._m.state
 
     @property
     def extra_state_attributes(self):
         """Informacyjne atrybuty (nie muszą być osobnymi encjami)."""
+        m = self._m
+        s = m.snapshot
         return {
-            "ip": self._ip,
-            "port": self._port,
-            "alarm_temp_min_c": self._temp_values[4],
-            "alarm_temp_max_c": self._temp_values[5],
-            "alarm_temp_hysteresis_c": self._temp_values[6],
-            "alarm_ph_min": self._alarm_ph_min,
-            "alarm_ph_max": self._alarm_ph_max,
-            "alarm_ph_hysteresis": self._alarm_ph_hysteresis,
-            "fan_driver_mode_raw": self._fan_driver_mode,
-            "fan_speed_raw": self._fan_speed,
-            "thermoreg_assigned_socket": self._thermoreg_assigned_socket,
-            "co2_assigned_socket": self._ph_meter_assigned_co2_socket,
-            "o2_assigned_socket": self._ph_meter_assigned_o2_socket,
-            "regulation_off_marker_min": self._regulation_off_marker,
-            "alarm_register": self._alarm_register,
-            "no_reg_set_minutes": self._no_reg_set_minutes,
+            "ip": m._ip,
+            "port": m._port,
+            "alarm_temp_min_c": s.alarm_temp_min,
+            "alarm_temp_max_c": s.alarm_temp_max,
+            "alarm_temp_hysteresis_c": s.alarm_temp_hysteresis,
+            "alarm_ph_min": s.alarm_ph_min,
+            "alarm_ph_max": s.alarm_ph_max,
+            "alarm_ph_hysteresis": s.alarm_ph_hysteresis,
+            "fan_driver_mode_raw": s.fan_mode,
+            "fan_speed_raw": s.fan_speed,
+            "thermoreg_assigned_socket": s.thermoreg_socket,
+            "co2_assigned_socket": s.co2_socket,
+            "o2_assigned_socket": s.o2_socket,
+            "regulation_off_marker_min": s.no_reg_minutes,
+            "alarm_register": s.alarm_register,
+            "no_reg_set_minutes": m.no_reg_set_minutes,
         }
 
-    async def async_send_command(self, command: str) -> None:
-        """Send a raw command to device (adds CRLF). Used by switch.py."""
-        loop = asyncio.get_event_loop()
-        msg = f"{command}\r\n"
-
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-            sock.settimeout(self._timeout)
-            await loop.run_in_executor(None, sock.connect, (self._ip, self._port))
-            await loop.run_in_executor(None, sock.sendall, msg.encode("utf-8"))
-            try:
-                await loop.run_in_executor(None, sock.recv, 1024)
-            except Exception:
-                pass
-
-    async def async_update(self):
-        if not self.entity_id:
-            _LOGGER.debug("Entity ID is not set. Skipping update.")
-            return
-
-        try:
-            data = await self._fetch_data()
-            valid_data = self._validate_response(data)
-
-            if not valid_data:
-                _LOGGER.warning("Invalid response from device: %s", data)
-                self._handle_error()
-                return
-
-            parsed = valid_data.split(";")
-            self._payload_parts = parsed
-            self._last_update_dt = dt_util.utcnow()
-
-            # Bezpieczny getter (żeby nie wywalić integracji gdy payload jest krótszy)
-            def g(idx: int) -> str:
-                return parsed[idx] if idx < len(parsed) else "???"
 
-            # --- podstawowe ---
-            self._ph_value = self._parse_ph(g(0))
-            temps_part = [g(i) for i in [1, 2, 3, 4, 20, 21, 22]]
-            self._temp_values = [self._parse_temp(v) for v in temps_part]
-            self._led = [self._parse_led(g(i)) for i in [13, 14, 15, 16]]
-            self._last_update_time = self._parse_time_stamp(g(19))
-
-            # --- dodatkowe ---
-            self._fan_driver_mode = self._parse_int(g(5))
-            self._fan_speed = self._parse_int(g(6))
-
-            self._thermoreg_assigned_socket = self._parse_int(g(7))
-            self._thermoreg_socket_state = self._parse_int(g(8))
-
-            self._ph_meter_assigned_co2_socket = self._parse_int(g(9))
-            self._ph_meter_co2_socket_state = self._parse_int(g(10))
-
-            self._ph_meter_assigned_o2_socket = self._parse_int(g(11))
-            self._ph_meter_o2_socket_state = self._parse_int(g(12))
-
-            self._regulation_off_marker = self._parse_int(g(17))
-            self._alarm_register = self._parse_int(g(18))
-
-            self._alarm_temp_hysteresis = self._parse_temp(g(22))
-            self._alarm_ph_min = self._parse_ph(g(23))
-            self._alarm_ph_max = self._parse_ph(g(24))
-            self._alarm_ph_hysteresis = self._parse_ph(g(25))
-
-            self._state = valid_data
-            self._error_count = 0
-            self.async_write_ha_state()
-
-        except socket.timeout:
-            _LOGGER.warning("Timeout while connecting to %s:%s", self._ip, self._port)
-            self._handle_error()
-        except (socket.error, socket.gaierror) as e:
-            _LOGGER.error("TCP connection error: %s", e)
-            self._handle_error()
-        except Exception as e:
-            _LOGGER.error("Unexpected error: %s", e)
-            self._handle_error()
-
-    async def _fetch_data(self):
-        loop = asyncio.get_event_loop()
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-            sock.settimeout(self._timeout)
-            await loop.run_in_executor(None, sock.connect, (self._ip, self._port))
-            await loop.run_in_executor(None, sock.sendall, self._payload.encode("utf-8"))
-            resp = await loop.run_in_executor(None, sock.recv, 2048)
-            return resp.decode("utf-8").strip()
-
-    def _validate_response(self, data: str):
-        if self._expected_prefix in data:
-            start_index = data.find(self._expected_prefix)
-            return data[start_index + len(self._expected_prefix):]
-        return None
-
-    def _handle_error(self):
-        self._error_count += 1
-        if self._error_count >= 5:
-            self._state = "unknown"
-            self.async_write_ha_state()
+# ---------------------- BASE CHILD ENTITY ----------------------
 
-    @staticmethod
-    def _parse_int(value: str):
-        try:
-            if value in (None, "", "???"):
-                return None
-            return int(value)
-        except Exception:
-            return None
+class MicroAQUAChildSensor(MicroAQUAEntity, SensorEntity):
+    """Base class for sensors derived from the payload fields."""
 
-    @staticmethod
-    def _parse_ph(value: str):
-        try:
-            if value in (None, "", "???"):
-                return None
-            return float(value) / 100.0
-        except Exception:
-            return None
+    # Indeksy pól payloadu, od których zależy stan (patrz MicroAQUAEntity)
+    _fields: tuple[int, ...] = ()
 
-    @staticmethod
-    def _parse_temp(value: str):
-        try:
-            if value in (None, "", "???"):
-                return None
-            return float(value) / 10.0
-        except Exception:
-            return None
+    def __init__(self, coordinator: MicroAQUACoordinator, fields=None):
+        super().__init__(coordinator, self._fields if fields is None else fields)
 
-    @staticmethod
-    def _parse_led(value: str):
-        try:
-            if value in (None, "", "???"):
-                return None
-            return int(value)
-        except Exception:
-            return None
+    @property
+    def _s(self):
+        """Current decoded snapshot."""
+        return self._m.snapshot
 
-    @staticmethod
-    def _parse_time_stamp(value: str):
-        try:
-            time_obj = datetime.strptime(value, "%H:%M:%S")
-            return time_obj.time()
-        except Exception:
-            return None
+    def _data_ready(self, min_length: int) -> bool:
+        return self._m.has_recent_data() and self._m.parts_length() >= min_length
 
 
-# ---------------------- BASE CHILD ENTITY ----------------------
+# ---------------------- BASIC SENSORS ----------------------
 
-class MicroAQUAChildSensor(SensorEntity):
-    """Base class: attaches to device + uses master reference."""
+# Co ile odświeżany jest wiek danych (między odczytami też rośnie)
+_AGE_TICK = timedelta(seconds=5)
 
-    _attr_has_entity_name = False
 
-    def __init__(self, master: MicroAQUASensor):
-        self._m = master
+class _DataAgeEntity(MicroAQUAChildSensor):
+    """Written on freshness flips and every ``_AGE_TICK`` in between.
 
-    @property
-    def device_info(self):
-        return self._m.device_info
+    With a stretched poll interval the last frame can be up to a minute
+    old while still fresh, so the age cannot wait for the next poll; HA
+    drops writes that change nothing.
+    """
 
-    @property
-    def available(self) -> bool:
-        return self._m.available
+    _fields = (AGE_FIELD,)
 
-    def _data_ready(self, min_length: int) -> bool:
-        return self._m.has_recent_data() and self._m.parts_length() >= min_length
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            async_track_time_interval(self.hass, self._async_age_tick, _AGE_TICK)
+        )
 
+    @callback
+    def _async_age_tick(self, _now) -> None:
+        self.async_write_ha_state()
 
-# ---------------------- BASIC SENSORS ----------------------
 
-class DataValidSensor(MicroAQUAChildSensor):
+class DataValidSensor(_DataAgeEntity):
     _attr_icon = "mdi:check-network-outline"
+    # Wiek zmienia się co kilka sekund - bez zapisu w historii
+    _unrecorded_attributes = frozenset({"age_seconds"})
 
-    def __init__(self, master: MicroAQUASensor):
-        super().__init__(master)
+    def __init__(self, coordinator: MicroAQUACoordinator):
+        super().__init__(coordinator)
         self._attr_name = f"{self._m.display_name} Data valid"
 
     @property
@@ -427,12 +249,12 @@ class DataValidSensor(MicroAQUAChildSensor):
         return f"{self._m.entity_prefix}_data_valid"
 
 
-class DataAgeSensor(MicroAQUAChildSensor):
+class DataAgeSensor(_DataAgeEntity):
     _attr_icon = "mdi:timer-outline"
     _attr_native_unit_of_measurement = "s"
 
-    def __init__(self, master: MicroAQUASensor):
-        super().__init__(master)
+    def __init__(self, coordinator: MicroAQUACoordinator):
+        super().__init__(coordinator)
         self._attr_name = f"{self._m.display_name} Data age"
 
     @property
@@ -447,15 +269,100 @@ class DataAgeSensor(MicroAQUAChildSensor):
         return f"{self._m.entity_prefix}_data_age"
 
 
-class PHSensor(MicroAQUAChildSensor):
-    _attr_name = "pH sensor"
-    _attr_icon = "hass:raspberry-pi"
+class DeadbandSensor(MicroAQUAChildSensor):
+    """Child sensor that publishes only moves beyond a deadband.
+
+    A new value is written when it differs from the last published one by
+    more than ``deadband``, when it becomes/stops being None, or when the
+    published value is older than ``heartbeat`` seconds (then the current
+    value is written even if it is within the deadband). Deadband 0 means
+    every change is published, as before.
+    """
+
+    def __init__(
+        self,
+        coordinator: MicroAQUACoordinator,
+        fields=None,
+        *,
+        deadband: float = 0,
+        heartbeat: int = DEFAULT_DEADBAND_HEARTBEAT,
+    ):
+        super().__init__(coordinator, fields)
+        self._deadband = deadband
+        self._heartbeat = heartbeat
+        self._published = None
+        self._published_at: Optional[float] = None
+        self._unsub_heartbeat = None
+
+    @abc.abstractmethod
+    def _current_value(self):
+        """Value to publish (None while there is no valid data)."""
 
     @property
     def state(self):
+        if not self._deadband:
+            return self._current_value()
+        return self._published
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        # Pierwszy zapis stanu (po dodaniu) pokazuje bieżącą wartość
+        self._published = self._current_value()
+        self._published_at = self.hass.loop.time()
+        self.async_on_remove(self._cancel_heartbeat)
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        if not self._deadband:
+            self.async_write_ha_state()
+            return
+        value = self._current_value()
+        old = self._published
+        if (
+            self._published_at is None
+            or value is None
+            or old is None
+            # Wartości skalowane (0.1 °C, 0.01 pH) - krok równy strefie nie może
+            # zależeć od błędu zaokrąglenia, stąd margines jak w koordynatorze
+            or abs(value - old) > self._deadband + 1e-9
+            or self.hass.loop.time() - self._published_at >= self._heartbeat
+        ):
+            self._publish(value)
+        elif self._unsub_heartbeat is None:
+            # Zmiana w martwej strefie - najpóźniej po heartbeat i tak ją zapiszemy
+            delay = self._published_at + self._heartbeat - self.hass.loop.time()
+            self._unsub_heartbeat = async_call_later(
+                self.hass, max(delay, 0), self._heartbeat_expired
+            )
+
+    @callback
+    def _heartbeat_expired(self, _now) -> None:
+        self._unsub_heartbeat = None
+        self._publish(self._current_value())
+
+    @callback
+    def _publish(self, value) -> None:
+        self._cancel_heartbeat()
+        self._published = value
+        self._published_at = self.hass.loop.time()
+        self.async_write_ha_state()
+
+    @callback
+    def _cancel_heartbeat(self) -> None:
+        if self._unsub_heartbeat is not None:
+            self._unsub_heartbeat()
+            self._unsub_heartbeat = None
+
+
+class PHSensor(DeadbandSensor):
+    _fields = (0,)
+    _attr_name = "pH sensor"
+    _attr_icon = "hass:raspberry-pi"
+
+    def _current_value(self):
         if not self._data_ready(26):
             return None
-        return self._m._parse_ph(self._m.get_part(0))
+        return self._s.ph
 
     @property
     def unit_of_measurement(self):
@@ -466,40 +373,45 @@ class PHSensor(MicroAQUAChildSensor):
         return f"{self._m.entity_prefix}_pH"
 
 
-class TempSensor(MicroAQUAChildSensor):
+class TempSensor(DeadbandSensor):
     _attr_native_unit_of_measurement = "°C"
 
-    def __init__(self, master: MicroAQUASensor, name: str, index: int, icon="mdi:thermometer"):
-        super().__init__(master)
+    def __init__(
+        self,
+        coordinator: MicroAQUACoordinator,
+        name: str,
+        index: int,
+        icon="mdi:thermometer",
+        **deadband,
+    ):
+        super().__init__(coordinator, fields=(index,), **deadband)
         self._index = index
         self._attr_name = name
         self._attr_icon = icon
 
-    @property
-    def state(self):
+    def _current_value(self):
         if not self._data_ready(self._index + 1):
             return None
-        return self._m._parse_temp(self._m.get_part(self._index))
+        return self._s.value(self._index)
 
     @property
     def unique_id(self):
         return f"{self._m.entity_prefix}_Temp{self._index}"
 
 
-class LEDSensor(MicroAQUAChildSensor):
+class LEDSensor(DeadbandSensor):
     _attr_native_unit_of_measurement = "%"
     _attr_icon = "hass:led-on"
 
-    def __init__(self, master: MicroAQUASensor, index: int):
-        super().__init__(master)
+    def __init__(self, coordinator: MicroAQUACoordinator, index: int, **deadband):
+        super().__init__(coordinator, fields=(12 + index,), **deadband)
         self._index = index
         self._attr_name = f"LED {index}"
 
-    @property
-    def state(self):
+    def _current_value(self):
         if not self._data_ready(12 + self._index + 1):
             return None
-        return self._m._parse_led(self._m.get_part(12 + self._index))
+        return self._s.value(12 + self._index)
 
     @property
     def unique_id(self):
@@ -507,6 +419,7 @@ class LEDSensor(MicroAQUAChildSensor):
 
 
 class LastUpdateTime(MicroAQUAChildSensor):
+    _fields = (19,)
     _attr_name = "Czas ostatniego pomiaru test"
     _attr_icon = "hass:clock"
 
@@ -514,7 +427,7 @@ class LastUpdateTime(MicroAQUAChildSensor):
     def state(self):
         if not self._data_ready(20):
             return None
-        return self._m.get_part(19)
+        return self._s.clock
 
     @property
     def unique_id(self):
@@ -526,6 +439,7 @@ class LastUpdateTime(MicroAQUAChildSensor):
 class NoRegTime(MicroAQUAChildSensor):
     """Czas bez regulacji (parsed_data[17]) — w YAML: uaqua_1_no_reg_time"""
 
+    _fields = (17,)
     _attr_name = "Czas bez regulacji"
     _attr_icon = "hass:power-plug-off"
 
@@ -533,10 +447,10 @@ class NoRegTime(MicroAQUAChildSensor):
     def state(self):
         if not self._data_ready(18):
             return None
-        v = self._m.get_part(17)
-        if v in (None, "???"):
+        v = self._s.no_reg_minutes
+        if v is None:
             return None
-        return "--" if v == "0" else f"{v}min"
+        return "--" if v == 0 else f"{v}min"
 
     @property
     def unique_id(self):
@@ -544,6 +458,7 @@ class NoRegTime(MicroAQUAChildSensor):
 
 
 class ThermoregSocket(MicroAQUAChildSensor):
+    _fields = (7, 8, 17)
     _attr_name = "Grzałka"
     _attr_icon = "hass:power-socket-eu"
 
@@ -551,15 +466,15 @@ class ThermoregSocket(MicroAQUAChildSensor):
     def state(self):
         if not self._data_ready(18):
             return None
-        if self._m.get_part(17) != "0":
+        s = self._s
+        if s.no_reg_minutes != 0:
             return "off"
-        assigned = self._m.get_part(7)
-        if assigned == "7":
+        if s.thermoreg_socket == SOCKET_UNASSIGNED:
             return "brak przypisanego gniazda"
-        v = self._m.get_part(8)
-        if v is None or v == "???":
+        v = s.thermoreg_socket_state
+        if v is None:
             return None
-        return "OFF" if v == "0" else "ON"
+        return "OFF" if v == 0 else "ON"
 
     @property
     def unique_id(self):
@@ -567,6 +482,7 @@ class ThermoregSocket(MicroAQUAChildSensor):
 
 
 class CO2Socket(MicroAQUAChildSensor):
+    _fields = (9, 10, 17)
     _attr_name = "Zawór CO2"
     _attr_icon = "hass:power-socket-eu"
 
@@ -574,15 +490,15 @@ class CO2Socket(MicroAQUAChildSensor):
     def state(self):
         if not self._data_ready(18):
             return None
-        if self._m.get_part(17) != "0":
+        s = self._s
+        if s.no_reg_minutes != 0:
             return "off"
-        assigned = self._m.get_part(9)
-        if assigned == "7":
+        if s.co2_socket == SOCKET_UNASSIGNED:
             return "brak przypisanego gniazda"
-        v = self._m.get_part(10)
-        if v is None or v == "???":
+        v = s.co2_socket_state
+        if v is None:
             return None
-        return "OFF" if v == "0" else "ON"
+        return "OFF" if v == 0 else "ON"
 
     @property
     def unique_id(self):
@@ -590,6 +506,7 @@ class CO2Socket(MicroAQUAChildSensor):
 
 
 class O2Socket(MicroAQUAChildSensor):
+    _fields = (11, 12, 17)
     _attr_name = "Zawór O2"
     _attr_icon = "hass:power-socket-eu"
 
@@ -597,15 +514,15 @@ class O2Socket(MicroAQUAChildSensor):
     def state(self):
         if not self._data_ready(18):
             return None
-        if self._m.get_part(17) != "0":
+        s = self._s
+        if s.no_reg_minutes != 0:
             return "off"
-        assigned = self._m.get_part(11)
-        if assigned == "7":
+        if s.o2_socket == SOCKET_UNASSIGNED:
             return "brak przypisanego gniazda"
-        v = self._m.get_part(12)
-        if v is None or v == "???":
+        v = s.o2_socket_state
+        if v is None:
             return None
-        return "off" if v == "0" else "on"
+        return "off" if v == 0 else "on"
 
     @property
     def unique_id(self):
@@ -615,6 +532,7 @@ class O2Socket(MicroAQUAChildSensor):
 class FanController(MicroAQUAChildSensor):
     """Odtwarza tekstowy opis jak w YAML: uaqua_1_fan_controller"""
 
+    _fields = (5, 6, 17)
     _attr_name = "Wentylator"
     _attr_icon = "hass:fan"
 
@@ -623,34 +541,35 @@ class FanController(MicroAQUAChildSensor):
         if not self._data_ready(18):
             return None
 
-        reg_off = self._m.get_part(17)
-        mode = self._m.get_part(5)
-        speed = self._m.get_part(6)
+        s = self._s
+        reg_off = s.no_reg_minutes
+        mode = s.fan_mode
+        speed = s.fan_speed
 
-        if reg_off != "0":
+        if reg_off != 0:
             return "off"
 
         if mode is None or speed is None:
             return None
 
-        if mode == "3":
+        if mode == 3:
             return "Moduł FAN wyłączony"
 
-        if mode == "2":
-            return "Praca okresowa: ON" if speed != "0" else "Praca okresowa: OFF"
+        if mode == 2:
+            return "Praca okresowa: ON" if speed != 0 else "Praca okresowa: OFF"
 
-        if mode == "1":
+        if mode == 1:
             power_map = {
-                "1": "Regulacja mocy: Rozruch",
-                "2": "Regulacja mocy: 20%",
-                "3": "Regulacja mocy: 40%",
-                "4": "Regulacja mocy: 60%",
-                "5": "Regulacja mocy: 80%",
-                "6": "Regulacja mocy: 100%",
+                1: "Regulacja mocy: Rozruch",
+                2: "Regulacja mocy: 20%",
+                3: "Regulacja mocy: 40%",
+                4: "Regulacja mocy: 60%",
+                5: "Regulacja mocy: 80%",
+                6: "Regulacja mocy: 100%",
             }
             return power_map.get(speed, "Regulacja mocy: OFF")
 
-        return "Praca ON/OFF: ON" if speed != "0" else "Praca ON/OFF: OFF"
+        return "Praca ON/OFF: ON" if speed != 0 else "Praca ON/OFF: OFF"
 
     @property
     def unique_id(self):
@@ -666,6 +585,7 @@ def _bit_is_set(value: Optional[int], bitmask: int) -> bool:
 
 
 class TempAlarms(MicroAQUAChildSensor):
+    _fields = (18,)
     _attr_name = "Alarm Temp min/max"
     _attr_icon = "hass:thermometer-alert"
 
@@ -673,10 +593,9 @@ class TempAlarms(MicroAQUAChildSensor):
     def state(self):
         if not self._data_ready(19):
             return None
-        ar_raw = self._m.get_part(18)
-        if ar_raw is None:
+        ar = self._s.alarm_register
+        if ar is None:
             return None
-        ar = int(ar_raw)
 
         muted = _bit_is_set(ar, 128)
 
@@ -694,6 +613,7 @@ class TempAlarms(MicroAQUAChildSensor):
 
 
 class PhAlarms(MicroAQUAChildSensor):
+    _fields = (18,)
     _attr_name = "Alarm pH min/max"
     _attr_icon = "hass:alert"
 
@@ -701,10 +621,9 @@ class PhAlarms(MicroAQUAChildSensor):
     def state(self):
         if not self._data_ready(19):
             return None
-        ar_raw = self._m.get_part(18)
-        if ar_raw is None:
+        ar = self._s.alarm_register
+        if ar is None:
             return None
-        ar = int(ar_raw)
 
         muted = _bit_is_set(ar, 128)
 
@@ -722,6 +641,7 @@ class PhAlarms(MicroAQUAChildSensor):
 
 
 class AcousticAlarmStatus(MicroAQUAChildSensor):
+    _fields = (18,)
     _attr_name = "Alarm Dźwiękowy Status"
     _attr_icon = "hass:volume-high"
 
@@ -729,10 +649,9 @@ class AcousticAlarmStatus(MicroAQUAChildSensor):
     def state(self):
         if not self._data_ready(19):
             return None
-        ar_raw = self._m.get_part(18)
-        if ar_raw is None:
+        ar = self._s.alarm_register
+        if ar is None:
             return None
-        ar = int(ar_raw)
 
         if (ar & 127) != 0:
             return "OFF" if _bit_is_set(ar, 128) else "ON"
@@ -746,6 +665,7 @@ class AcousticAlarmStatus(MicroAQUAChildSensor):
 # ---------------------- temp alarm values ----------------------
 
 class AlarmTempMinValue(MicroAQUAChildSensor):
+    _fields = (20, 22)
     _attr_name = "Alarm Temp. min. value"
     _attr_icon = "hass:thermometer-alert"
 
@@ -753,11 +673,11 @@ class AlarmTempMinValue(MicroAQUAChildSensor):
     def state(self):
         if not self._data_ready(23):
             return None
-        value = self._m.get_part(20)
-        hysteresis = self._m.get_part(22)
-        if value in (None, "???") or hysteresis in (None, "???"):
+        value = self._s.value(20)
+        hysteresis = self._s.value(22)
+        if value is None or hysteresis is None:
             return None
-        return f"{self._m._parse_temp(value)} +/-{self._m._parse_temp(hysteresis)}"
+        return f"{value} +/-{hysteresis}"
 
     @property
     def unique_id(self):
@@ -765,6 +685,7 @@ class AlarmTempMinValue(MicroAQUAChildSensor):
 
 
 class AlarmTempMaxValue(MicroAQUAChildSensor):
+    _fields = (21, 22)
     _attr_name = "Alarm Temp. max. value"
     _attr_icon = "hass:thermometer-alert"
 
@@ -772,11 +693,11 @@ class AlarmTempMaxValue(MicroAQUAChildSensor):
     def state(self):
         if not self._data_ready(23):
             return None
-        value = self._m.get_part(21)
-        hysteresis = self._m.get_part(22)
-        if value in (None, "???") or hysteresis in (None, "???"):
+        value = self._s.value(21)
+        hysteresis = self._s.value(22)
+        if value is None or hysteresis is None:
             return None
-        return f"{self._m._parse_temp(value)} +/-{self._m._parse_temp(hysteresis)}"
+        return f"{value} +/-{hysteresis}"
 
     @property
     def unique_id(self):
@@ -786,6 +707,7 @@ class AlarmTempMaxValue(MicroAQUAChildSensor):
 # ---------------------- pH threshold sensors ----------------------
 
 class AlarmPhMinValue(MicroAQUAChildSensor):
+    _fields = (23, 25)
     _attr_name = "Alarm pH min. value"
     _attr_icon = "hass:alert"
 
@@ -793,11 +715,11 @@ class AlarmPhMinValue(MicroAQUAChildSensor):
     def state(self):
         if not self._data_ready(26):
             return None
-        value = self._m.get_part(23)
-        hysteresis = self._m.get_part(25)
-        if value in (None, "???") or hysteresis in (None, "???"):
+        value = self._s.value(23)
+        hysteresis = self._s.value(25)
+        if value is None or hysteresis is None:
             return None
-        return f"{self._m._parse_ph(value)} +/-{self._m._parse_ph(hysteresis)} pH"
+        return f"{value} +/-{hysteresis} pH"
 
     @property
     def unique_id(self):
@@ -805,6 +727,7 @@ class AlarmPhMinValue(MicroAQUAChildSensor):
 
 
 class AlarmPhMaxValue(MicroAQUAChildSensor):
+    _fields = (24, 25)
     _attr_name = "Alarm pH max. value"
     _attr_icon = "hass:alert"
 
@@ -812,11 +735,11 @@ class AlarmPhMaxValue(MicroAQUAChildSensor):
     def state(self):
         if not self._data_ready(26):
             return None
-        value = self._m.get_part(24)
-        hysteresis = self._m.get_part(25)
-        if value in (None, "???") or hysteresis in (None, "???"):
+        value = self._s.value(24)
+        hysteresis = self._s.value(25)
+        if value is None or hysteresis is None:
             return None
-        return f"{self._m._parse_ph(value)} +/-{self._m._parse_ph(hysteresis)} pH"
+        return f"{value} +/-{hysteresis} pH"
 
     @property
     def unique_id(self):
@@ -826,26 +749,181 @@ class AlarmPhMaxValue(MicroAQUAChildSensor):
 # ---------------------- optional raw debug sensors ----------------------
 
 class FanDriverModeRaw(MicroAQUAChildSensor):
+    _fields = (5,)
     _attr_name = "Fan driver mode (raw)"
     _attr_icon = "mdi:chip"
 
     @property
     def state(self):
-        return self._m._fan_driver_mode
+        return self._s.fan_mode
 
     @property
     def unique_id(self):
-        return f"{self._m.unique_id}_fan_driver_mode_raw"
+        return f"{self._m.entity_prefix}_fan_driver_mode_raw"
 
 
 class FanSpeedRaw(MicroAQUAChildSensor):
+    _fields = (6,)
     _attr_name = "Fan speed (raw)"
     _attr_icon = "mdi:speedometer"
 
     @property
     def state(self):
-        return self._m._fan_speed
+        return self._s.fan_speed
+
+    @property
+    def unique_id(self):
+        return f"{self._m.entity_prefix}_fan_speed_raw"
+
+
+# ---------------------- interval aggregates ----------------------
+
+# indeks pola -> (nazwa, jednostka, fragment unique_id)
+_AGGREGATE_LABELS = {
+    0: ("pH", "pH", "pH"),
+    1: ("Czujnik Temperatury 1", "°C", "Temp1"),
+    2: ("Czujnik Temperatury 2", "°C", "Temp2"),
+    3: ("Czujnik Temperatury 3", "°C", "Temp3"),
+    4: ("Czujnik Temperatury 4", "°C", "Temp4"),
+}
+
+_STAT_POSITION = {"min": 0, "max": 1, "mean": 2}
+
+
+class AggregateSensor(MicroAQUAChildSensor):
+    """min, max or mean of a series over the last closed interval.
+
+    Written once per interval (e.g. once a minute) instead of every poll,
+    so long-term statistics come from these rather than the raw sensors.
+    """
+
+    _fields = (AGGREGATE_FIELD,)
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_icon = "mdi:chart-line"
+    _unrecorded_attributes = frozenset({"interval_end"})
+
+    def __init__(self, coordinator: MicroAQUACoordinator, index: int, stat: str):
+        super().__init__(coordinator)
+        name, unit, key = _AGGREGATE_LABELS[index]
+        interval = coordinator.aggregator.interval
+        period = f"{interval // 60} min" if interval % 60 == 0 else f"{interval} s"
+        self._index = index
+        self._stat = stat
+        self._attr_name = f"{name} {stat} {period}"
+        self._attr_native_unit_of_measurement = unit
+        self._unique_key = key
+
+    @property
+    def unique_id(self):
+        return f"{self._m.entity_prefix}_{self._unique_key}_{self._stat}"
+
+    @property
+    def available(self) -> bool:
+        return self._m.available and self._m.aggregator.results[self._index] is not None
+
+    @property
+    def native_value(self):
+        result = self._m.aggregator.results[self._index]
+        if result is None:
+            return None
+        # Jedna cyfra więcej niż wysyła urządzenie (ma sens dla średniej)
+        return round(result[_STAT_POSITION[self._stat]], 3 if self._index == 0 else 2)
+
+    @property
+    def extra_state_attributes(self):
+        closed_at = self._m.aggregator.closed_at
+        if closed_at is None:
+            return None
+        return {"interval_end": dt_util.utc_from_timestamp(closed_at).isoformat()}
+
+
+# ---------------------- diagnostics (disabled by default) ----------------------
+
+# (klucz, nazwa, jednostka, state_class, wartość, atrybuty)
+_DIAGNOSTIC_SENSORS = (
+    ("error_count", "Poll errors in a row", None, SensorStateClass.MEASUREMENT,
+     lambda m: m.error_count, None),
+    ("timeouts", "Timeouts", None, SensorStateClass.TOTAL_INCREASING,
+     lambda m: m.stats.timeouts, None),
+    ("connection_errors", "Connection errors", None, SensorStateClass.TOTAL_INCREASING,
+     lambda m: m.stats.connection_errors, None),
+    ("invalid_frames", "Invalid frames", None, SensorStateClass.TOTAL_INCREASING,
+     lambda m: m.stats.invalid_frames, None),
+    ("poll_overruns", "Poll overruns", None, SensorStateClass.TOTAL_INCREASING,
+     lambda m: m.stats.overruns, None),
+    ("skipped_polls", "Skipped polls", None, SensorStateClass.TOTAL_INCREASING,
+     lambda m: m.stats.skipped_polls, None),
+    ("bytes_in", "Bytes received", "B", SensorStateClass.TOTAL_INCREASING,
+     lambda m: m.stats.bytes_in, None),
+    ("bytes_out", "Bytes sent", "B", SensorStateClass.TOTAL_INCREASING,
+     lambda m: m.stats.bytes_out, None),
+    ("receive_latency", "Receive latency", "ms", SensorStateClass.MEASUREMENT,
+     lambda m: m.stats.receive.mean, lambda m: m.stats.receive.as_dict()),
+    ("send_latency", "Send latency", "ms", SensorStateClass.MEASUREMENT,
+     lambda m: m.stats.send.mean, lambda m: m.stats.send.as_dict()),
+    ("connect_latency", "Connect latency", "ms", SensorStateClass.MEASUREMENT,
+     lambda m: m.stats.connect.mean, lambda m: m.stats.connect.as_dict()),
+    ("queue_wait", "Queue wait", "ms", SensorStateClass.MEASUREMENT,
+     lambda m: m.stats.queue_wait.mean, lambda m: m.stats.queue_wait.as_dict()),
+)
+
+
+class DiagnosticSensor(MicroAQUAEntity, SensorEntity):
+    """Transport/poll counter of one controller (see stats.py).
+
+    Not tied to frame fields: polled by the sensor platform on its scan
+    interval (30 s) instead of written on every poll, and available while
+    the controller is down (that is when it matters).
+    """
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    _attr_icon = "mdi:chart-bell-curve"
+    # Histogramy nie muszą trafiać do historii
+    _unrecorded_attributes = frozenset(
+        {"count", "mean_ms", "max_ms", "p50_ms", "p90_ms", "p99_ms", "buckets"}
+    )
+
+    def __init__(
+        self,
+        coordinator: MicroAQUACoordinator,
+        key: str,
+        name: str,
+        unit: Optional[str],
+        state_class: Optional[str],
+        value: Callable[[MicroAQUACoordinator], Any],
+        attributes: Optional[Callable[[MicroAQUACoordinator], dict]],
+    ):
+        super().__init__(coordinator, fields=())
+        self._key = key
+        self._value = value
+        self._attributes = attributes
+        self._attr_name = f"{self._m.display_name} {name}"
+        self._attr_native_unit_of_measurement = unit
+        self._attr_state_class = state_class
 
     @property
     def unique_id(self):
-        return f"{self._m.unique_id}_fan_speed_raw"
+        return f"{self._m.entity_prefix}_diag_{self._key}"
+
+    @property
+    def available(self) -> bool:
+        return True
+
+    @property
+    def should_poll(self) -> bool:
+        # CoordinatorEntity zwraca tu na sztywno False (atrybut _attr_ nie działa)
+        return True
+
+    @property
+    def native_value(self):
+        return self._value(self._m)
+
+    @property
+    def extra_state_attributes(self):
+        if self._attributes is None:
+            return None
+        return self._attributes(self._m)
+
+    async def async_update(self) -> None:
+        """Nothing to fetch - the counters live in the coordinator."""
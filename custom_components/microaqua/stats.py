@@ -0,0 +1,126 @@
+"""Per-controller transport and poll counters (diagnostics)."""
+from __future__ import annotations
+
+import bisect
+from typing import Any, Optional
+
+# Granice kubełków histogramu w ms (ostatni kubełek: powyżej 2000 ms)
+LATENCY_BUCKETS_MS: tuple[float, ...] = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram; constant memory, O(log n) add."""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        ms = seconds * 1000.0
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    @property
+    def mean(self) -> Optional[float]:
+        return round(self.total / self.count, 3) if self.count else None
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Upper bound (ms) of the bucket holding the given percentile."""
+        if not self.count:
+            return None
+        rank = self.count * pct / 100.0
+        seen = 0
+        for bound, n in zip(LATENCY_BUCKETS_MS, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return round(self.max, 3)
+
+    def as_dict(self) -> dict[str, Any]:
+        labels = [f"<={b:g}ms" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]:g}ms"]
+        return {
+            "count": self.count,
+            "mean_ms": self.mean,
+            "max_ms": round(self.max, 3),
+            "p50_ms": self.percentile(50),
+            "p90_ms": self.percentile(90),
+            "p99_ms": self.percentile(99),
+            "buckets": {label: n for label, n in zip(labels, self.counts) if n},
+        }
+
+
+class MicroAQUAStats:
+    """Counters of one controller, filled by the client and the coordinator.
+
+    Everything is cumulative since the entry was set up.
+    """
+
+    __slots__ = (
+        "connect",
+        "send",
+        "receive",
+        "queue_wait",
+        "connects",
+        "dns_lookups",
+        "bytes_in",
+        "bytes_out",
+        "polls",
+        "invalid_frames",
+        "timeouts",
+        "connection_errors",
+        "overruns",
+        "skipped_polls",
+        "commands",
+        "command_rollbacks",
+    )
+
+    def __init__(self):
+        self.connect = LatencyHistogram()
+        self.send = LatencyHistogram()
+        self.receive = LatencyHistogram()
+        # Czas oczekiwania zapytania w kolejce klienta (na zajęte połączenie)
+        self.queue_wait = LatencyHistogram()
+        self.connects = 0
+        self.dns_lookups = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.polls = 0
+        self.invalid_frames = 0
+        self.timeouts = 0
+        self.connection_errors = 0
+        # Odczyty przerwane po przekroczeniu budżetu całego cyklu
+        self.overruns = 0
+        # Odczyty porzucone w kolejce klienta (termin minął przed wysłaniem)
+        self.skipped_polls = 0
+        self.commands = 0
+        # Optymistyczny stan po komendzie niepotwierdzony przez następny odczyt
+        self.command_rollbacks = 0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "polls": self.polls,
+            "connects": self.connects,
+            "dns_lookups": self.dns_lookups,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "invalid_frames": self.invalid_frames,
+            "timeouts": self.timeouts,
+            "connection_errors": self.connection_errors,
+            "overruns": self.overruns,
+            "skipped_polls": self.skipped_polls,
+            "commands": self.commands,
+            "command_rollbacks": self.command_rollbacks,
+            "latency": {
+                "connect": self.connect.as_dict(),
+                "send": self.send.as_dict(),
+                "receive": self.receive.as_dict(),
+                "queue_wait": self.queue_wait.as_dict(),
+            },
+        }
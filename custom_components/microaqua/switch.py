@@ -3,62 +3,36 @@ from __future__ import annotations
 import logging
 
 from homeassistant.components.switch import SwitchEntity
-from homeassistant.core import HomeAssistant, callback
+from homeassistant.core import HomeAssistant
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.helpers.event import async_track_state_change_event
 
 from .const import DOMAIN
+from .entity import MicroAQUAEntity
 
 _LOGGER = logging.getLogger(__name__)
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities):
-    master = hass.data[DOMAIN][entry.entry_id]["master"]
+    coordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
     async_add_entities(
         [
-            RegulationOnOffSwitch(master),
-            DisarmSoundAlarmSwitch(master),
-        ],
-        True,
+            RegulationOnOffSwitch(coordinator),
+            DisarmSoundAlarmSwitch(coordinator),
+        ]
     )
 
 
-class _MicroAquaSwitch(SwitchEntity):
-    _attr_has_entity_name = False
-    _attr_should_poll = False
+class _MicroAquaSwitch(MicroAQUAEntity, SwitchEntity):
+    """Switch fed by the coordinator (no state-change event subscription)."""
 
-    def __init__(self, master):
-        self._m = master
-        self._unsub_state = None
+    _fields: tuple[int, ...] = ()
 
-    @property
-    def device_info(self):
-        return self._m.device_info
-
-    @property
-    def available(self) -> bool:
-        return self._m.available
-
-    async def async_added_to_hass(self) -> None:
-        await super().async_added_to_hass()
-        if self._m.entity_id:
-            self._unsub_state = async_track_state_change_event(
-                self.hass,
-                [self._m.entity_id],
-                self._handle_master_state_change,
-            )
-
-    async def async_will_remove_from_hass(self) -> None:
-        if self._unsub_state:
-            self._unsub_state()
-            self._unsub_state = None
-
-    @callback
-    def _handle_master_state_change(self, _event) -> None:
-        self.async_write_ha_state()
+    def __init__(self, coordinator):
+        super().__init__(coordinator, self._fields)
 
 
 class RegulationOnOffSwitch(_MicroAquaSwitch):
+    _fields = (17,)
     _attr_name = "Regulacja ON/OFF"
 
     @property
@@ -73,32 +47,31 @@ class RegulationOnOffSwitch(_MicroAquaSwitch):
     def is_on(self) -> bool:
         if not self.available:
             return False
-        value = self._m.get_part(17)
-        return value is not None and value != "0"
+        value = self._m.snapshot.no_reg_minutes
+        return value is not None and value != 0
 
     @property
     def icon(self) -> str:
-        if self._m.get_part(17) == "0":
+        if self._m.snapshot.no_reg_minutes == 0:
             return "hass:power-plug"
         return "hass:power-plug-off"
 
     async def async_turn_on(self, **kwargs) -> None:
         try:
-            minutes = int(getattr(self._m, "_no_reg_set_minutes", 0))
+            minutes = self._m.no_reg_set_minutes
             await self._m.async_send_command(f"AT+TCPENRM;{minutes}")
-            await self._m.async_update()
         except Exception as e:
             _LOGGER.error("Failed to set regulation ON: %s", e)
 
     async def async_turn_off(self, **kwargs) -> None:
         try:
             await self._m.async_send_command("AT+TCPLNRM")
-            await self._m.async_update()
         except Exception as e:
             _LOGGER.error("Failed to set regulation OFF: %s", e)
 
 
 class DisarmSoundAlarmSwitch(_MicroAquaSwitch):
+    _fields = (18,)
     _attr_name = "Wyłącz Alarm Dźwiękowy"
 
     @property
@@ -106,13 +79,8 @@ class DisarmSoundAlarmSwitch(_MicroAquaSwitch):
         return f"{self._m.entity_prefix}_disarm_sound_alarm"
 
     def _alarm_register(self) -> int:
-        raw = self._m.get_part(18)
-        if raw is None:
-            return 0
-        try:
-            return int(raw)
-        except ValueError:
-            return 0
+        value = self._m.snapshot.alarm_register
+        return 0 if value is None else value
 
     @property
     def available(self) -> bool:
@@ -135,7 +103,6 @@ class DisarmSoundAlarmSwitch(_MicroAquaSwitch):
     async def async_turn_off(self, **kwargs) -> None:
         try:
             await self._m.async_send_command("AT+TCPTOA")
-            await self._m.async_update()
         except Exception as e:
             _LOGGER.error("Failed to disarm sound alarm: %s", e)
 
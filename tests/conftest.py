@@ -0,0 +1,20 @@
+"""Fixtures shared by the microAQUA tests."""
+import pytest
+
+pytest_plugins = "pytest_homeassistant_custom_component"
+
+# Ramka z prawdziwego sterownika (26 pól)
+REAL_FRAME = "715;255;260;0;0;0;0;0;1;7;0;7;0;100;50;0;0;0;0;12:00:03;200;300;10;650;750;10"
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(enable_custom_integrations):
+    yield
+
+
+def frame_with(**fields: str) -> str:
+    """REAL_FRAME with some fields replaced (``f0="700"`` sets field 0)."""
+    parts = REAL_FRAME.split(";")
+    for key, value in fields.items():
+        parts[int(key[1:])] = value
+    return ";".join(parts)
@@ -0,0 +1,56 @@
+"""Tests of the discovery path of the config flow."""
+from unittest.mock import patch
+
+from homeassistant import config_entries
+from homeassistant.data_entry_flow import FlowResultType
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.microaqua.const import DOMAIN
+from custom_components.microaqua.discovery import DiscoveredController
+
+SUBNET = {"subnet": "192.168.1.0/24", "port": 4000, "payload": "TEST"}
+
+
+async def _pick_form(hass, ips):
+    """Run the flow up to the list of found controllers."""
+    found = [DiscoveredController(ip, 26) for ip in ips]
+    result = await hass.config_entries.flow.async_init(
+        DOMAIN, context={"source": config_entries.SOURCE_USER}
+    )
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"], {"next_step_id": "discovery"}
+    )
+    with patch(
+        "custom_components.microaqua.config_flow.async_scan", return_value=found
+    ):
+        return await hass.config_entries.flow.async_configure(
+            result["flow_id"], SUBNET
+        )
+
+
+async def test_pick_names_each_device_after_its_ip(hass):
+    """Two picked controllers get different names and entity prefixes."""
+    with patch("custom_components.microaqua.async_setup_entry", return_value=True):
+        for ip in ("192.168.1.5", "192.168.1.6"):
+            result = await _pick_form(hass, [ip])
+            assert result["step_id"] == "pick"
+            result = await hass.config_entries.flow.async_configure(
+                result["flow_id"], {"ip": ip}
+            )
+            assert result["type"] == FlowResultType.CREATE_ENTRY
+            assert result["data"]["name"] == ip
+            assert result["result"].unique_id == ip
+
+
+async def test_pick_aborts_on_configured_ip(hass):
+    """A controller configured while the list was open is not added twice."""
+    result = await _pick_form(hass, ["192.168.1.5"])
+    MockConfigEntry(
+        domain=DOMAIN, unique_id="192.168.1.5", data={"ip": "192.168.1.5"}
+    ).add_to_hass(hass)
+
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"], {"ip": "192.168.1.5"}
+    )
+    assert result["type"] == FlowResultType.ABORT
+    assert result["reason"] == "already_configured"
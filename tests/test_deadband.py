@@ -0,0 +1,74 @@
+"""Deadband publishing of the pH and temperature sensors."""
+import pytest
+
+from custom_components.microaqua.coordinator import MicroAQUACoordinator
+from custom_components.microaqua.sensor import PHSensor, TempSensor
+
+from .conftest import frame_with
+
+
+class _FrameCoordinator(MicroAQUACoordinator):
+    """Answers every poll with ``self.frame`` (no network)."""
+
+    frame = ""
+
+    async def _fetch_data(self) -> str:
+        return self.frame
+
+
+@pytest.fixture
+async def coordinator(hass):
+    coordinator = _FrameCoordinator(
+        hass,
+        "127.0.0.1",
+        0,
+        "TCPSCP?",
+        "microAQUA test",
+        update_interval=1,
+        timeout=1,
+        data_valid_seconds=3600,
+    )
+    yield coordinator
+    await coordinator.async_close()
+
+
+async def _published(hass, coordinator, sensor, field: int, raw_values):
+    """Feed raw field values one by one; the sensor state after each."""
+    sensor.hass = hass
+    sensor.async_write_ha_state = lambda: None
+    states = []
+    for raw in raw_values:
+        coordinator.frame = frame_with(**{f"f{field}": raw})
+        await coordinator.async_refresh()
+        sensor._handle_coordinator_update()
+        states.append(sensor.state)
+    sensor._cancel_heartbeat()
+    return states
+
+
+@pytest.mark.parametrize(
+    ("old", "new"),
+    [("250", "251"), ("251", "252"), ("252", "251")],
+)
+async def test_temp_one_step_within_deadband(hass, coordinator, old, new):
+    """A one-step move equal to the deadband is never published."""
+    sensor = TempSensor(coordinator, "T1", 1, deadband=0.1)
+    states = await _published(hass, coordinator, sensor, 1, [old, new])
+    assert states[0] == states[1] == int(old) / 10
+
+
+@pytest.mark.parametrize(
+    ("old", "new"),
+    [("714", "715"), ("715", "716"), ("700", "701"), ("701", "700")],
+)
+async def test_ph_one_step_within_deadband(hass, coordinator, old, new):
+    """Same for pH: 7.14/7.15, 7.15/7.16 and 7.00/7.01 behave alike."""
+    sensor = PHSensor(coordinator, deadband=0.01)
+    states = await _published(hass, coordinator, sensor, 0, [old, new])
+    assert states[0] == states[1] == int(old) / 100
+
+
+async def test_two_steps_published(hass, coordinator):
+    sensor = TempSensor(coordinator, "T1", 1, deadband=0.1)
+    states = await _published(hass, coordinator, sensor, 1, ["250", "251", "252"])
+    assert states == [25.0, 25.0, 25.2]
@@ -0,0 +1,86 @@
+"""Setup, reload and unload of a config entry against a simulated controller."""
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from homeassistant.config_entries import ConfigEntryState
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.microaqua.const import DATA_ENGINE, DOMAIN
+from tools.simulator import DEFAULT_PAYLOAD, start_servers
+
+
+@pytest.fixture
+async def controller(socket_enabled):
+    """One simulated controller on a free local port."""
+    controllers, servers = await start_servers(1, port=0)
+    controllers[0].port = servers[0].sockets[0].getsockname()[1]
+    yield controllers[0]
+    servers[0].close()
+    await servers[0].wait_closed()
+
+
+@pytest.fixture
+async def entry(hass, controller):
+    """A loaded entry polling the simulated controller."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        title="microAQUA 1",
+        data={
+            "name": "microAQUA 1",
+            "ip": "127.0.0.1",
+            "port": controller.port,
+            "payload": DEFAULT_PAYLOAD,
+            "update_interval": 1,
+            "timeout": 2,
+            "persistent_connection": True,
+        },
+    )
+    entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    assert entry.state is ConfigEntryState.LOADED
+    return entry
+
+
+async def test_unload_releases_everything(hass, controller, entry):
+    """Unloading leaves no tasks, connections, engine or hass.data behind."""
+    tasks = asyncio.all_tasks()
+    engine = hass.data[DATA_ENGINE]
+    assert controller.connections == 1
+    assert hass.states.async_entity_ids("sensor")
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
+    # Serwer zamyka swoją stronę połączenia po odczycie EOF
+    await asyncio.sleep(0.05)
+
+    assert entry.state is ConfigEntryState.NOT_LOADED
+    assert controller.connections == 0
+    assert DOMAIN not in hass.data
+    assert DATA_ENGINE not in hass.data
+    assert not engine._entries and not engine._polls
+    assert engine._task is None or engine._task.done()
+    leftover = [
+        task
+        for task in asyncio.all_tasks() - tasks
+        if not task.done() and DOMAIN in task.get_name()
+    ]
+    assert not leftover
+
+
+async def test_rename_in_options_reloads_once(hass, entry):
+    """Saving options with a new name reloads the entry a single time."""
+    result = await hass.config_entries.options.async_init(entry.entry_id)
+    options = {**entry.data, "name": "Akwarium"}
+    with patch(
+        "custom_components.microaqua.config_flow._async_test_connection"
+    ), patch.object(
+        hass.config_entries, "async_reload", wraps=hass.config_entries.async_reload
+    ) as reload:
+        await hass.config_entries.options.async_configure(result["flow_id"], options)
+        await hass.async_block_till_done()
+
+    assert reload.call_count == 1
+    assert entry.title == "Akwarium"
+    assert entry.state is ConfigEntryState.LOADED
@@ -0,0 +1,158 @@
+"""End-to-end polling benchmark against simulated controllers.
+
+Starts tools/simulator.py in a child process (so its CPU is not counted),
+creates one MicroAQUACoordinator per simulated device, registers them in
+the shared MicroAQUAPollEngine - the same path __init__.async_setup_entry
+uses - and lets them poll for a while:
+
+    python -m tools.benchmark                  # 1, 10, 100 and 500 devices
+    python -m tools.benchmark --devices 100 --duration 30
+
+Reported per run: poll latency percentiles (request -> decoded frame),
+CPU time of this process per poll, polls per second and failed polls.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from homeassistant.core import HomeAssistant
+
+# websocket_api nie importuje się jako pierwszy moduł HA (cykl z http)
+import homeassistant.components.persistent_notification  # noqa: F401
+
+from custom_components.microaqua.coordinator import MicroAQUACoordinator
+from custom_components.microaqua.engine import MicroAQUAPollEngine
+
+from .simulator import DEFAULT_PAYLOAD, DEFAULT_PORT
+
+DEFAULT_DEVICES = (1, 10, 100, 500)
+
+
+class TimedCoordinator(MicroAQUACoordinator):
+    """Coordinator recording the latency of every successful fetch."""
+
+    def __init__(self, *args, latencies: list[float], **kwargs):
+        super().__init__(*args, **kwargs)
+        self._latencies = latencies
+        self.failed = 0
+
+    def _handle_error(self):
+        self.failed += 1
+        return super()._handle_error()
+
+    async def _fetch_data(self) -> str:
+        started = time.perf_counter()
+        data = await super()._fetch_data()
+        self._latencies.append(time.perf_counter() - started)
+        return data
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return float("nan")
+    index = min(int(len(sorted_values) * pct / 100), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+async def _run_once(hass: HomeAssistant, count: int, args) -> dict:
+    latencies: list[float] = []
+    coordinators = [
+        TimedCoordinator(
+            hass,
+            "127.0.0.1",
+            args.port + i,
+            DEFAULT_PAYLOAD,
+            f"microAQUA {i + 1}",
+            update_interval=args.interval,
+            timeout=args.timeout,
+            data_valid_seconds=5,
+            latencies=latencies,
+        )
+        for i in range(count)
+    ]
+    engine = MicroAQUAPollEngine.async_get(hass)
+    for coordinator in coordinators:
+        engine.async_register(coordinator)
+
+    # Rozbieg: pierwsze połączenia nie wchodzą do wyników
+    await asyncio.sleep(args.interval * 2)
+    latencies.clear()
+    failed = sum(c.failed for c in coordinators)
+    cpu, wall = time.process_time(), time.perf_counter()
+    await asyncio.sleep(args.duration)
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    polls = len(latencies)
+    failed = sum(c.failed for c in coordinators) - failed
+
+    for coordinator in coordinators:
+        await coordinator.async_close()
+
+    latencies.sort()
+    return {
+        "devices": count,
+        "polls": polls,
+        "failed": failed,
+        "polls_per_s": polls / wall,
+        "cpu_per_poll_us": cpu / polls * 1e6 if polls else float("nan"),
+        "p50_ms": _percentile(latencies, 50) * 1e3,
+        "p90_ms": _percentile(latencies, 90) * 1e3,
+        "p99_ms": _percentile(latencies, 99) * 1e3,
+        "max_ms": (latencies[-1] if latencies else float("nan")) * 1e3,
+        "mean_ms": (statistics.fmean(latencies) if latencies else float("nan")) * 1e3,
+    }
+
+
+def _start_simulator(count: int, port: int) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "tools.simulator", "--count", str(count), "--port", str(port)],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    line = proc.stdout.readline()
+    if not line.startswith("READY"):
+        proc.kill()
+        raise RuntimeError(f"Simulator did not start: {line!r}")
+    return proc
+
+
+async def _main(args) -> None:
+    columns = ("devices", "polls", "failed", "polls_per_s", "cpu_per_poll_us",
+               "p50_ms", "p90_ms", "p99_ms", "max_ms")
+    print(" ".join(f"{c:>15}" for c in columns))
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        for count in args.devices:
+            proc = _start_simulator(count, args.port)
+            try:
+                result = await _run_once(hass, count, args)
+            finally:
+                proc.terminate()
+                proc.wait()
+            print(" ".join(
+                f"{result[c]:>15.2f}" if isinstance(result[c], float) else f"{result[c]:>15}"
+                for c in columns
+            ), flush=True)
+        await hass.async_stop(force=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, nargs="+", default=list(DEFAULT_DEVICES))
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--interval", type=int, default=1, help="update_interval [s]")
+    parser.add_argument("--timeout", type=int, default=2)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""Microbenchmarks for reply framing and frame decoding.
+
+Covers the per-poll hot path: FrameBuffer (prefix search, line splitting,
+overflow guard), decode_frame() and reading every value the entities
+show. The corpus holds a real frame plus synthetic truncated,
+garbage-prefixed, split and oversized replies. Two more cases read what
+HA reads on a state write - ``state`` (``native_value``/``is_on``) and
+the attributes - from every sensor and switch entity of one device.
+
+    python -m tools.microbench                 # print results
+    python -m tools.microbench --save          # write tools/microbench_baseline.json
+    python -m tools.microbench --check         # exit 1 on regression
+
+Time is the best of several repeats (us per frame); memory is the
+tracemalloc peak of one frame (bytes). Absolute times depend on the
+machine, so every case is also expressed relative to a fixed pure-Python
+calibration loop timed in the same process, and --check compares that
+ratio: a case fails when its ratio is above the baseline by more than
+--tolerance or it allocates more than --alloc-tolerance. Run --save
+after an intended change (.github/workflows/microbench.yml runs --check).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import pathlib
+import sys
+import timeit
+import tempfile
+import tracemalloc
+from typing import Callable
+
+from homeassistant import config_entries
+from homeassistant.core import HomeAssistant
+
+# websocket_api nie importuje się jako pierwszy moduł HA (cykl z http)
+import homeassistant.components.persistent_notification  # noqa: F401
+
+from custom_components.microaqua import sensor, switch
+from custom_components.microaqua.client import FrameBuffer, FrameError
+from custom_components.microaqua.const import DOMAIN
+from custom_components.microaqua.coordinator import MicroAQUACoordinator
+from custom_components.microaqua.decoder import FIELD_NAMES, decode_frame
+
+BASELINE = pathlib.Path(__file__).with_name("microbench_baseline.json")
+
+PREFIX = b"AT+TCPSCP?="
+# Ramka z prawdziwego sterownika
+REAL_FRAME = b"715;255;260;0;0;0;0;0;1;7;0;7;0;100;50;0;0;0;0;12:00:03;200;300;10;650;750;10"
+
+CORPUS: dict[str, list[bytes]] = {
+    "valid": [PREFIX + REAL_FRAME + b"\r\n"],
+    "split": [PREFIX + REAL_FRAME[:10], REAL_FRAME[10:50], REAL_FRAME[50:] + b"\r\n"],
+    "truncated": [PREFIX + b";".join(REAL_FRAME.split(b";")[:12]) + b"\r\n"],
+    "garbage_prefixed": [b"\x00\xff\x13noise OK\r\n\x7f" + PREFIX + REAL_FRAME + b"\r\n"],
+    "unexpected_reply": [b"ERROR\r\n"],
+    "oversized": [b"7" * 5000],
+}
+
+
+class _FrameCoordinator(MicroAQUACoordinator):
+    """Coordinator answering every poll with REAL_FRAME (no network)."""
+
+    async def _fetch_data(self) -> str:
+        return REAL_FRAME.decode()
+
+
+def _calibration() -> None:
+    """Fixed reference work: split, convert and format a frame-like line."""
+    total = 0
+    for part in "715;255;260;0;0;0;0;1;7;0;7;100;50".split(";") * 4:
+        total += int(part)
+        f"{total / 100:.2f}"
+
+
+def _read_all(snapshot) -> None:
+    """What the entities read on an update (every field + the clock)."""
+    for name in FIELD_NAMES:
+        getattr(snapshot, name)
+    snapshot.device_time
+
+
+def _case(chunks: list[bytes]) -> Callable[[], None]:
+    buffer = FrameBuffer()
+
+    def run() -> None:
+        buffer.clear()
+        try:
+            for chunk in chunks:
+                buffer.feed(chunk)
+        except FrameError:
+            return
+        frame = buffer.pop_frame(PREFIX)
+        if frame is not None:
+            _read_all(decode_frame(frame.decode("utf-8", "replace")))
+
+    return run
+
+
+async def _async_entities(hass: HomeAssistant) -> tuple[list, list]:
+    """Sensor and switch entities of one device, built by their platforms."""
+    entry = config_entries.ConfigEntry(
+        version=1,
+        minor_version=1,
+        domain=DOMAIN,
+        title="microbench",
+        data={"name": "microAQUA bench"},
+        source=config_entries.SOURCE_USER,
+    )
+    coordinator = _FrameCoordinator(
+        hass,
+        "127.0.0.1",
+        0,
+        "TCPSCP?",
+        "microAQUA bench",
+        update_interval=1,
+        timeout=2,
+        data_valid_seconds=3600,
+    )
+    await coordinator.async_refresh()
+    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = {"coordinator": coordinator}
+    sensors, switches = [], []
+    await sensor.async_setup_entry(hass, entry, sensors.extend)
+    await switch.async_setup_entry(hass, entry, switches.extend)
+    for entity in (*sensors, *switches):
+        entity.hass = hass
+    return sensors, switches
+
+
+def _entity_case(entities: list) -> Callable[[], None]:
+    def run() -> None:
+        # To samo, co czyta async_write_ha_state
+        for entity in entities:
+            entity.state
+            entity.extra_state_attributes
+
+    return run
+
+
+def _time_us(func: Callable[[], None], number: int, repeat: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e6
+
+
+def _peak_bytes(func: Callable[[], None]) -> int:
+    func()  # rozgrzewka (cache, interning)
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        func()
+        return tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+
+
+async def _async_run(number: int, repeat: int) -> dict[str, dict[str, float]]:
+    cases = {name: _case(chunks) for name, chunks in CORPUS.items()}
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        sensors, switches = await _async_entities(hass)
+        cases["entity_sensors"] = _entity_case(sensors)
+        cases["entity_switches"] = _entity_case(switches)
+
+        reference = _time_us(_calibration, number, repeat)
+        results = {}
+        for name, func in cases.items():
+            time_us = _time_us(func, number, repeat)
+            results[name] = {
+                "time_us": round(time_us, 3),
+                "ratio": round(time_us / reference, 3),
+                "peak_bytes": _peak_bytes(func),
+            }
+        await hass.data[DOMAIN].popitem()[1]["coordinator"].async_close()
+        await hass.async_stop(force=True)
+    return results
+
+
+def run(number: int, repeat: int) -> dict[str, dict[str, float]]:
+    return asyncio.run(_async_run(number, repeat))
+
+
+def check(results, baseline, tolerance: float, alloc_tolerance: float) -> list[str]:
+    failures = []
+    for name, result in results.items():
+        ref = baseline.get(name)
+        if ref is None:
+            continue
+        if result["ratio"] > ref["ratio"] * (1 + tolerance):
+            failures.append(
+                f"{name}: {result['ratio']}x calibration > {ref['ratio']}x"
+            )
+        if result["peak_bytes"] > ref["peak_bytes"] * (1 + alloc_tolerance):
+            failures.append(f"{name}: {result['peak_bytes']} B > {ref['peak_bytes']} B")
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--save", action="store_true")
+    parser.add_argument("--check", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    parser.add_argument("--alloc-tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    results = run(args.number, args.repeat)
+    baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    print(
+        f"{'case':<18}{'us/frame':>10}{'ratio':>8}{'baseline':>10}"
+        f"{'peak B':>9}{'baseline':>10}"
+    )
+    for name, result in results.items():
+        ref = baseline.get(name, {})
+        print(
+            f"{name:<18}{result['time_us']:>10.2f}{result['ratio']:>8.2f}"
+            f"{ref.get('ratio', float('nan')):>10.2f}"
+            f"{result['peak_bytes']:>9}{ref.get('peak_bytes', '-'):>10}"
+        )
+
+    if args.save:
+        BASELINE.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"Baseline written to {BASELINE}")
+    if args.check:
+        if not baseline:
+            print("No baseline, run with --save first")
+            return 1
+        failures = check(results, baseline, args.tolerance, args.alloc_tolerance)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+"""Reload leak check: reload one config entry many times.
+
+Starts a simulated controller in this process, sets up a microAQUA
+config entry in a bare Home Assistant instance and reloads it over and
+over - the path every options change takes:
+
+    python -m tools.reload_check                     # 1000 reloads
+    python -m tools.reload_check --reloads 200 --warmup 20
+
+After ``--warmup`` reloads the traced memory, the number of asyncio
+tasks, open client connections and live coordinator objects are
+recorded; after the last reload they must be back at that level (memory
+within ``--memory-tolerance`` bytes). Exits 1 on a leak, so it can run
+in CI next to tools.microbench --check.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import logging
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from homeassistant import config_entries, loader
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import (
+    area_registry as ar,
+    device_registry as dr,
+    entity,
+    entity_registry as er,
+)
+from homeassistant.helpers.entity_platform import DATA_ENTITY_PLATFORM
+
+# websocket_api nie importuje się jako pierwszy moduł HA (cykl z http)
+import homeassistant.components.persistent_notification  # noqa: F401
+from homeassistant.setup import async_setup_component
+
+from custom_components.microaqua.const import DOMAIN
+from custom_components.microaqua.coordinator import MicroAQUACoordinator
+
+from .simulator import DEFAULT_PAYLOAD, start_servers
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _snapshot(hass: HomeAssistant, controller) -> dict:
+    gc.collect()
+    return {
+        "memory": tracemalloc.get_traced_memory()[0],
+        "tasks": len(asyncio.all_tasks()),
+        "connections": controller.connections,
+        "coordinators": sum(
+            isinstance(obj, MicroAQUACoordinator) for obj in gc.get_objects()
+        ),
+        "states": len(hass.states.async_all()),
+    }
+
+
+def _prune_reset_platforms(hass: HomeAssistant) -> int:
+    """Drop EntityPlatforms that HA reset but kept registered.
+
+    In HA 2024.2 EntityComponent.async_unload_entry calls async_reset()
+    instead of async_destroy(), so HA itself keeps every unloaded
+    platform in hass.data - not something the integration can release.
+    """
+    platforms = hass.data.get(DATA_ENTITY_PLATFORM, {}).get(DOMAIN, [])
+    alive = [platform for platform in platforms if platform.entities]
+    pruned = len(platforms) - len(alive)
+    platforms[:] = alive
+    return pruned
+
+
+async def _async_start_hass(config_dir: str) -> HomeAssistant:
+    hass = HomeAssistant(config_dir)
+    hass.config.skip_pip = True
+    # Integracja z repozytorium widoczna jako custom_components/microaqua
+    os.symlink(
+        os.path.join(ROOT, "custom_components"),
+        os.path.join(config_dir, "custom_components"),
+    )
+    loader.async_setup(hass)
+    entity.async_setup(hass)
+    await asyncio.gather(
+        ar.async_load(hass), dr.async_load(hass), er.async_load(hass)
+    )
+    hass.config_entries = config_entries.ConfigEntries(hass, {})
+    await hass.config_entries.async_initialize()
+    await hass.async_start()
+    # Bez auth i serwera HTTP: komendy websocket wystarczy zarejestrować
+    hass.config.components.update({"http", "websocket_api"})
+    assert await async_setup_component(hass, DOMAIN, {})
+    return hass
+
+
+async def _main(args) -> int:
+    controllers, servers = await start_servers(1, port=args.port)
+    controller = controllers[0]
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = await _async_start_hass(config_dir)
+        entry = config_entries.ConfigEntry(
+            version=1,
+            minor_version=1,
+            domain=DOMAIN,
+            title="reload check",
+            data={
+                "name": "microAQUA reload",
+                "ip": "127.0.0.1",
+                "port": args.port,
+                "payload": DEFAULT_PAYLOAD,
+                "update_interval": 1,
+                "timeout": 2,
+                "data_valid_seconds": 5,
+            },
+            source=config_entries.SOURCE_USER,
+        )
+        await hass.config_entries.async_add(entry)
+        await hass.async_block_till_done()
+        if entry.state is not config_entries.ConfigEntryState.LOADED:
+            print(f"Entry did not load: {entry.state}")
+            return 1
+
+        tracemalloc.start()
+        before = None
+        pruned = 0
+        for i in range(args.warmup + args.reloads):
+            if i == args.warmup:
+                before = _snapshot(hass, controller)
+            assert await hass.config_entries.async_reload(entry.entry_id)
+            await hass.async_block_till_done()
+            pruned += _prune_reset_platforms(hass)
+        after = _snapshot(hass, controller)
+        tracemalloc.stop()
+
+        await hass.config_entries.async_unload(entry.entry_id)
+        await hass.async_block_till_done()
+        leftover = len(hass.data.get(DOMAIN, ()))
+        await hass.async_stop(force=True)
+
+    for server in servers:
+        server.close()
+        await server.wait_closed()
+
+    print(f"{'':>12} {'before':>12} {'after':>12}")
+    for key in before:
+        print(f"{key:>12} {before[key]:>12} {after[key]:>12}")
+    print(f"{'hass.data':>12} {'':>12} {leftover:>12}")
+    if pruned:
+        print(f"(pruned {pruned} entity platforms kept by HA itself)")
+
+    failed = [
+        key
+        for key in ("tasks", "connections", "coordinators", "states")
+        if after[key] > before[key]
+    ]
+    if after["memory"] - before["memory"] > args.memory_tolerance:
+        failed.append("memory")
+    if leftover:
+        failed.append("hass.data")
+    if failed:
+        print(f"LEAK: {', '.join(failed)} grew over {args.reloads} reloads")
+        return 1
+    print(f"OK: {args.reloads} reloads")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reloads", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--port", type=int, default=17963)
+    parser.add_argument(
+        "--memory-tolerance",
+        type=int,
+        default=256 * 1024,
+        help="allowed growth of traced memory in bytes (default: 256 KiB)",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    sys.exit(asyncio.run(_main(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""microAQUA controller simulator (TCP, same text protocol as the device).
+
+Answers ``AT+TCPSCP?`` with a 26-field status frame and handles the
+commands the integration sends:
+
+- ``AT+TCPENRM;<min>`` - regulation off for <min> minutes (field 17),
+- ``AT+TCPLNRM``       - regulation back on (field 17 = 0),
+- ``AT+TCPTOA``        - mute the sound alarm (bit 128 of field 18).
+
+Every simulated controller listens on its own port:
+
+    python -m tools.simulator --count 10 --port 17963
+
+prints ``READY <first port> <count>`` once all servers listen.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+from typing import Optional
+
+DEFAULT_PORT = 17963
+DEFAULT_PAYLOAD = "TCPSCP?"
+
+# Bity rejestru alarmów (pole 18): 0..6 alarmy, 7 = alarm wyciszony
+ALARM_MUTED = 128
+
+
+class SimulatedController:
+    """State of one controller; values drift slowly like real probes."""
+
+    def __init__(self, seed: int, *, payload: str = DEFAULT_PAYLOAD):
+        self._rng = random.Random(seed)
+        self.payload = payload
+        self.ph = 7.00 + self._rng.uniform(-0.3, 0.3)
+        self.temps = [25.0 + self._rng.uniform(-1.0, 1.0), 24.0, 0.0, 0.0]
+        self.leds = [100, 50, 0, 0]
+        self.fan_mode = 0
+        self.fan_speed = 0
+        self.sockets = [(0, 1), (7, 0), (7, 0)]  # (gniazdo, stan): termo, CO2, O2
+        self.alarm_register = 0
+        self._no_reg_until: Optional[float] = None
+        self.polls = 0
+        self.commands = 0
+        # Otwarte połączenia klientów (tools.reload_check)
+        self.connections = 0
+
+    @property
+    def no_reg_minutes(self) -> int:
+        if self._no_reg_until is None:
+            return 0
+        left = self._no_reg_until - time.monotonic()
+        if left <= 0:
+            self._no_reg_until = None
+            return 0
+        return int(left // 60) + 1
+
+    def frame(self) -> str:
+        self.polls += 1
+        rng = self._rng
+        self.ph = min(max(self.ph + rng.uniform(-0.01, 0.01), 6.0), 8.0)
+        self.temps[0] += rng.uniform(-0.05, 0.05)
+        self.temps[1] += rng.uniform(-0.05, 0.05)
+        thermo, co2, o2 = self.sockets
+        fields = [
+            round(self.ph * 100),
+            *(round(t * 10) for t in self.temps),
+            self.fan_mode,
+            self.fan_speed,
+            *thermo,
+            *co2,
+            *o2,
+            *self.leds,
+            self.no_reg_minutes,
+            self.alarm_register,
+            time.strftime("%H:%M:%S"),
+            200, 300, 10,  # alarm temp min/max/histereza (x10)
+            650, 750, 10,  # alarm pH min/max/histereza (x100)
+        ]
+        return f"AT+{self.payload}=" + ";".join(str(f) for f in fields)
+
+    def command(self, line: str) -> str:
+        self.commands += 1
+        name, _, arg = line.partition(";")
+        if name == "AT+TCPENRM":
+            try:
+                minutes = int(arg)
+            except ValueError:
+                return "ERROR"
+            self._no_reg_until = time.monotonic() + minutes * 60 if minutes > 0 else None
+        elif name == "AT+TCPLNRM":
+            self._no_reg_until = None
+        elif name == "AT+TCPTOA":
+            if self.alarm_register & 127:
+                self.alarm_register |= ALARM_MUTED
+        else:
+            return "ERROR"
+        return "OK"
+
+    def reply(self, line: str) -> str:
+        if line == f"AT+{self.payload}":
+            return self.frame()
+        return self.command(line)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            while line := await reader.readline():
+                line = line.strip().decode("ascii", "replace")
+                if not line:
+                    continue
+                writer.write(self.reply(line).encode("ascii") + b"\r\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+
+async def start_servers(
+    count: int, port: int = DEFAULT_PORT, host: str = "127.0.0.1"
+) -> tuple[list[SimulatedController], list[asyncio.base_events.Server]]:
+    """Start ``count`` controllers on consecutive ports starting at ``port``."""
+    controllers, servers = [], []
+    for i in range(count):
+        controller = SimulatedController(seed=i)
+        servers.append(await asyncio.start_server(controller.handle, host, port + i))
+        controllers.append(controller)
+    return controllers, servers
+
+
+async def _main(args: argparse.Namespace) -> None:
+    _, servers = await start_servers(args.count, args.port, args.host)
+    print(f"READY {args.port} {args.count}", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for server in servers:
+            server.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=1)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--host", default="127.0.0.1")
+    try:
+        asyncio.run(_main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()